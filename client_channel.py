@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+CarrotView 클라이언트 송신 채널
+클라이언트마다 송신 스레드 하나와 두 개의 레인을 둠
+
+- 우선순위 레인 : 경고/상태 전환 이벤트 (일반 텔레메트리보다 항상 먼저 전송)
+- 텔레메트리 레인: 일반 프레임 (한도 초과 시 오래된 프레임부터 폐기)
+
+이벤트는 생성 시각부터 소켓 전송 완료까지의 지연을 클라이언트별로 따로 측정함
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+
+from socket_tuning import set_cork
+
+
+# 텔레메트리 레인 최대 대기 프레임 수 (10Hz 기준 약 1초)
+DEFAULT_TELEMETRY_BACKLOG = 10
+
+# 선행 프레임(백필 배치)을 만들고 보내는 동안에는 레인 한도 대신 이 한도 적용 (seq가 끊기지 않도록, 100Hz 기준 10초)
+PREAMBLE_CATCHUP_BACKLOG = 1000
+
+# 송신이 이 시간 이상 막히면 (수신하지 않는 클라이언트) 연결 종료
+DEFAULT_SEND_TIMEOUT = 10.0
+
+# 이벤트 종류
+EVENT_ALERT = "alert"
+EVENT_STATE_TRANSITION = "stateTransition"
+
+
+class LatencyStats:
+    """지연 시간 통계 (최근 샘플 기준 백분위)"""
+
+    def __init__(self, max_samples=1000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, float]:
+        """밀리초 단위 요약"""
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class StateEventDetector:
+    """
+    controlsState 변화 감지
+    enabled/active 변화 -> stateTransition, alertText/alertStatus 변화 -> alert
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = None
+        self.seq = 0
+
+    def detect(self, controls_state: tuple, timestamp_ms: int) -> List[dict]:
+        """controls_state = (enabled, active, alertText, alertStatus)"""
+        with self._lock:
+            last, self._last = self._last, controls_state
+            if last is None or last == controls_state:
+                return []
+
+            events = []
+            enabled, active, alert_text, alert_status = controls_state
+            if (enabled, active) != last[:2]:
+                events.append(self._event(EVENT_STATE_TRANSITION, timestamp_ms, {
+                    "enabled": enabled, "active": active,
+                    "previous": {"enabled": last[0], "active": last[1]}
+                }))
+            if (alert_text, alert_status) != last[2:]:
+                events.append(self._event(EVENT_ALERT, timestamp_ms, {
+                    "alertText": alert_text, "alertStatus": alert_status
+                }))
+            return events
+
+    def _event(self, kind: str, timestamp_ms: int, body: dict) -> dict:
+        self.seq += 1
+        event = {"type": "event", "event": kind, "seq": self.seq, "timestamp": timestamp_ms}
+        event.update(body)
+        return event
+
+
+class ClientChannel:
+    """클라이언트 1개의 송신 큐 + 송신 스레드"""
+
+    def __init__(self, sock, address=None, data_format="json", events=True, udp_address=None,
+                 compression=None, max_hz=None, track_budget=None, clock=None, profiler=None,
+                 preamble: Union[bytes, Callable[[], bytes], None] = None, cork=False,
+                 telemetry_backlog=DEFAULT_TELEMETRY_BACKLOG, send_timeout=DEFAULT_SEND_TIMEOUT):
+        self.sock = sock
+        self.sock.settimeout(send_timeout)
+        self.address = address
+        self.data_format = data_format
+        self.events = events  # 이벤트 프레임 수신 여부
+        self.udp_address = udp_address  # 설정 시 텔레메트리는 UDP로 전송 (TCP는 제어/이벤트용)
+        self.compression = compression  # None 또는 "gzip"
+        self.min_interval = 1.0 / max_hz if max_hz else 0.0  # 이 간격 안에 들어온 텔레메트리는 건너뜀
+        self._last_telemetry = None
+        self._now = clock.monotonic if clock is not None else time.perf_counter  # max_hz 기준 (가상 시간이면 틱 시각)
+        self.track_budget = track_budget  # liveTracks 예산 (track_lod.TrackBudget, None이면 전체)
+        self.profiler = profiler  # 켜져 있으면 sendall 시간을 "send" 단계로 기록
+        self.preamble = preamble  # 두 레인보다 먼저 보낼 프레임 (히스토리 백필 배치, 함수면 송신 스레드에서 생성)
+        self.cork = cork  # 레인에 프레임이 더 남아 있는 동안 코르크 (socket_tuning)
+        self.alive = True
+
+        self._cond = threading.Condition()
+        self._priority = deque()                              # (frame, created)
+        self._telemetry = deque()                             # frame
+        self.telemetry_backlog = telemetry_backlog
+        self._catching_up = preamble is not None  # 선행 프레임 이후 밀린 프레임을 다 보낼 때까지 True
+        self.dropped_frames = 0
+        self.conflated_frames = 0  # max_hz 제한으로 건너뛴 프레임
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.event_latency = LatencyStats()
+
+        self._thread = threading.Thread(target=self._run, name=f"client-send-{address}", daemon=True)
+        self._thread.start()
+
+    def send_event(self, frame: bytes, created: Optional[float] = None):
+        """우선순위 레인에 이벤트 프레임 추가 (created: time.perf_counter 기준 생성 시각)"""
+        with self._cond:
+            self._priority.append((frame, created if created is not None else time.perf_counter()))
+            self._cond.notify_all()
+
+    def admit_telemetry(self) -> bool:
+        """max_hz 제한 확인 (이번 프레임을 보내야 하면 True, UDP 전송에도 같은 제한 적용)"""
+        if self.min_interval:
+            now = self._now()
+            if self._last_telemetry is not None and now - self._last_telemetry < self.min_interval:
+                self.conflated_frames += 1
+                return False
+            self._last_telemetry = now
+        return True
+
+    def send_telemetry(self, frame: bytes):
+        """텔레메트리 레인에 프레임 추가 (가득 차면 가장 오래된 프레임 폐기)"""
+        if not self.admit_telemetry():
+            return
+        with self._cond:
+            limit = PREAMBLE_CATCHUP_BACKLOG if self._catching_up else self.telemetry_backlog
+            if len(self._telemetry) >= limit:
+                self._telemetry.popleft()
+                self.dropped_frames += 1
+            self._telemetry.append(frame)
+            self._cond.notify_all()
+
+    def wait_drained(self, timeout: Optional[float] = None) -> bool:
+        """두 레인이 모두 빌 때까지 대기 (가상 시간 서버가 프레임 폐기 없이 다음 틱으로 가도록)"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self.alive or (not self._priority and not self._telemetry), timeout)
+
+    def _run(self):
+        """송신 루프: 선행 프레임을 먼저 보내고, 이후 우선순위 레인을 먼저 비움"""
+        if self.preamble is not None:
+            try:
+                preamble = self.preamble() if callable(self.preamble) else self.preamble
+                self.sock.sendall(preamble)
+                self.sent_bytes += len(preamble)
+            except Exception:  # 생성/전송 실패 시 연결 종료 (서버가 다음 틱에 정리)
+                self.alive = False
+            self.preamble = None
+        corked = False
+        while self.alive:
+            with self._cond:
+                while self.alive and not self._priority and not self._telemetry:
+                    self._cond.wait(1.0)
+                if not self.alive:
+                    break
+                if self._priority:
+                    frame, created = self._priority.popleft()
+                else:
+                    frame, created = self._telemetry.popleft(), None
+                    if self._catching_up and len(self._telemetry) < self.telemetry_backlog:
+                        self._catching_up = False
+                pending = bool(self._priority or self._telemetry)
+                self._cond.notify_all()  # wait_drained 대기자
+
+            stages = self.profiler.stages if self.profiler else None
+            try:
+                # 밀린 프레임이 있으면 코르크로 모았다가 마지막 프레임 뒤에 한 번에 내보냄
+                if self.cork and pending and not corked:
+                    set_cork(self.sock, True)
+                    corked = True
+                if stages is None:
+                    self.sock.sendall(frame)
+                else:
+                    started = time.perf_counter()
+                    self.sock.sendall(frame)
+                    stages.record("send", time.perf_counter() - started)
+                if corked and not pending:
+                    set_cork(self.sock, False)
+                    corked = False
+                self.sent_frames += 1
+                self.sent_bytes += len(frame)
+            except OSError:
+                self.alive = False
+                break
+
+            if created is not None:
+                self.event_latency.record(time.perf_counter() - created)
+
+    def close(self):
+        """채널 종료 (송신 스레드 정지 + 소켓 닫기)"""
+        with self._cond:
+            self.alive = False
+            self._cond.notify_all()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
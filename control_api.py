@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+CarrotView 테스트 서버 제어 API
+input() 메뉴 대신 로컬 HTTP로 차량 상태를 바꾸고, 시각이 지정된 명령 스크립트를 실행함
+모든 변경은 서버의 상태 잠금 안에서 한 번에 적용되므로 틱 중간에 반쯤 바뀐 상태가 전송되지 않음
+
+명령 필드
+  speed (m/s), enabled, active, gear, alert_text, alert_status, tracks (주변 차량 수), tick_hz
+
+HTTP (기본 127.0.0.1:8090)
+  GET    /state     현재 제어 상태
+  POST   /command   {"speed": 20, "enabled": true, "active": true}
+  POST   /script    {"loop": false, "steps": [{"at": 0, "speed": 10}, {"at": 5.0, "active": true}]}
+  GET    /script    스크립트 진행 상태
+  DELETE /script    스크립트 중지
+  POST   /profile   {"mode": "sampling"} 또는 {"mode": "cprofile", "duration": 10}
+  GET    /profile   프로파일링 상태 (마지막 결과 파일 경로 포함)
+  DELETE /profile   프로파일링 종료 + 결과 저장
+
+사용법
+  python control_api.py state
+  python control_api.py set speed=20 enabled=true active=true gear=drive
+  python control_api.py run scenario.json
+  python control_api.py stop
+  python control_api.py profile start --mode cprofile --duration 10
+"""
+
+import argparse
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from profiling import PROFILE_MODES
+from sim_clock import SystemClock
+
+
+CONTROL_PORT = 8090
+
+GEARS = ("park", "reverse", "neutral", "drive")
+ALERT_STATUSES = ("normal", "userPrompt", "critical")
+
+# 명령 필드 -> (타입, 최소, 최대)  문자열 필드는 허용 값 목록
+CONTROL_FIELDS = {
+    "speed": (float, 0.0, 100.0),
+    "enabled": (bool, None, None),
+    "active": (bool, None, None),
+    "gear": (str, GEARS, None),
+    "alert_text": (str, None, None),
+    "alert_status": (str, ALERT_STATUSES, None),
+    "tracks": (int, 0, 64),
+    "tick_hz": (float, 0.1, 1000.0),
+}
+
+
+def parse_command(command: Dict[str, Any]) -> Dict[str, Any]:
+    """명령 검증 후 정규화된 변경 사항 반환 (잘못된 필드/값이면 ValueError)"""
+    if not isinstance(command, dict) or not command:
+        raise ValueError("명령은 비어 있지 않은 JSON 객체여야 합니다")
+
+    changes = {}
+    for key, value in command.items():
+        if key not in CONTROL_FIELDS:
+            raise ValueError(f"알 수 없는 필드: {key}")
+        kind, low, high = CONTROL_FIELDS[key]
+
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{key}: true/false 필요")
+        elif kind is str:
+            if not isinstance(value, str):
+                raise ValueError(f"{key}: 문자열 필요")
+            if low is not None and value not in low:
+                raise ValueError(f"{key}: {', '.join(low)} 중 하나 필요")
+        else:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key}: 숫자 필요")
+            if kind is int and value != int(value):
+                raise ValueError(f"{key}: 정수 필요")
+            value = kind(value)
+            if not low <= value <= high:
+                raise ValueError(f"{key}: {low}~{high} 범위 필요")
+        changes[key] = value
+    return changes
+
+
+def parse_assignments(assignments: List[str]) -> Dict[str, Any]:
+    """CLI 인자 ["speed=20", "enabled=true", "gear=drive"] -> 명령 (값은 JSON, 아니면 문자열)"""
+    command = {}
+    for assignment in assignments:
+        key, sep, raw = assignment.partition('=')
+        if not sep:
+            raise ValueError(f"key=value 형식 필요: {assignment}")
+        try:
+            command[key] = json.loads(raw)
+        except ValueError:
+            command[key] = raw
+    return parse_command(command)
+
+
+def parse_script(script: Any) -> Dict[str, Any]:
+    """스크립트 검증 -> {"loop": bool, "steps": [(at, changes), ...]} (at 오름차순)"""
+    if isinstance(script, list):
+        script = {"steps": script}
+    if not isinstance(script, dict) or not isinstance(script.get("steps"), list) or not script["steps"]:
+        raise ValueError("스크립트에는 steps 목록이 필요합니다")
+
+    steps = []
+    for index, step in enumerate(script["steps"]):
+        if not isinstance(step, dict):
+            raise ValueError(f"steps[{index}]: JSON 객체 필요")
+        step = dict(step)
+        at = step.pop("at", None)
+        if isinstance(at, bool) or not isinstance(at, (int, float)) or at < 0:
+            raise ValueError(f"steps[{index}]: at(초, 0 이상) 필요")
+        try:
+            steps.append((float(at), parse_command(step)))
+        except ValueError as e:
+            raise ValueError(f"steps[{index}]: {e}")
+
+    steps.sort(key=lambda step: step[0])
+    return {"loop": bool(script.get("loop", False)), "steps": steps}
+
+
+def parse_profile(body: Any) -> Dict[str, Any]:
+    """POST /profile 요청 검증 -> RuntimeProfiler.start 인자"""
+    body = body or {}
+    if not isinstance(body, dict):
+        raise ValueError("프로파일 요청은 JSON 객체여야 합니다")
+    unknown = set(body) - {"mode", "duration"}
+    if unknown:
+        raise ValueError(f"알 수 없는 프로파일 필드: {', '.join(sorted(unknown))}")
+    options = {"mode": body.get("mode", "sampling")}
+    if options["mode"] not in PROFILE_MODES:
+        raise ValueError(f"mode는 {', '.join(PROFILE_MODES)} 중 하나여야 합니다")
+    duration = body.get("duration")
+    if duration is not None:
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 < duration <= 600:
+            raise ValueError("duration은 0 초과 600 이하의 초 단위 숫자여야 합니다")
+        options["duration"] = float(duration)
+    return options
+
+
+def read_script_file(path: str) -> Any:
+    """스크립트 파일 읽기 (JSON 객체/배열, 또는 한 줄에 단계 하나인 JSONL)"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_script(path: str) -> Dict[str, Any]:
+    """스크립트 파일 읽기 + 검증"""
+    return parse_script(read_script_file(path))
+
+
+class ScriptRunner:
+    """시각이 지정된 명령 스크립트 실행 (at = 스크립트 시작 후 경과 초, 시계 기준)"""
+
+    def __init__(self, script: Dict[str, Any], apply: Callable[[Dict[str, Any]], Any], clock=None):
+        self.steps = script["steps"]
+        self.loop = script["loop"]
+        self.apply = apply
+        self.clock = clock or SystemClock()
+        self.executed = 0
+        self.started = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._finished = threading.Event()
+
+    def start(self):
+        self.started = self.clock.monotonic()
+        self._schedule(0)
+        return self
+
+    def _schedule(self, index: int):
+        with self._lock:
+            if self._finished.is_set():
+                return
+            if index == len(self.steps):
+                if not self.loop:
+                    self._finished.set()
+                    return
+                # 반복 시 마지막 단계 시각을 한 주기로 봄
+                self.started += max(self.steps[-1][0], 0.001)
+                index = 0
+            self._timer = self.clock.call_at(self.started + self.steps[index][0],
+                                             lambda: self._fire(index))
+
+    def _fire(self, index: int):
+        if self._finished.is_set():
+            return
+        try:
+            self.apply(self.steps[index][1])
+        except Exception as e:
+            # 타이머 스레드에서 예외가 사라지지 않도록 기록하고 스크립트 중단 (status()에 반영)
+            print(f"❌ 스크립트 {index + 1}단계 실패: {e}")
+            self.error = f"{index + 1}단계: {e}"
+            self._finished.set()
+            return
+        self.executed += 1
+        self._schedule(index + 1)
+
+    @property
+    def running(self) -> bool:
+        return not self._finished.is_set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "loop": self.loop,
+            "steps": len(self.steps),
+            "executed": self.executed,
+            "error": self.error,
+            "elapsed": self.clock.monotonic() - self.started if self.started is not None else 0.0,
+        }
+
+    def stop(self):
+        with self._lock:
+            self._finished.set()
+            if self._timer:
+                self._timer.cancel()
+
+    def wait(self, timeout: Optional[float] = None):
+        self._finished.wait(timeout)
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    """HTTP 요청 -> ControlServer"""
+
+    def do_GET(self):
+        if self.path == "/state":
+            self._reply(200, self.server.control.target.control_snapshot())
+        elif self.path == "/script":
+            self._reply(200, self.server.control.script_status())
+        elif self.path == "/profile":
+            self._reply(200, self.server.control.target.profiler.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'null')
+            if self.path == "/command":
+                self._reply(200, self.server.control.target.apply_control(parse_command(body)))
+            elif self.path == "/script":
+                self._reply(202, self.server.control.run_script(parse_script(body)))
+            elif self.path == "/profile":
+                self._reply(202, self.server.control.target.profiler.start(**parse_profile(body)))
+            else:
+                self._reply(404, {"error": "not found"})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+
+    def do_DELETE(self):
+        if self.path == "/script":
+            self._reply(200, self.server.control.stop_script())
+        elif self.path == "/profile":
+            self._reply(200, self.server.control.target.profiler.stop())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _reply(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그 출력 안 함
+
+
+class ControlServer:
+    """
+    로컬 HTTP 제어 서버
+    target은 apply_control(changes) -> dict, control_snapshot() -> dict, profiler 를 제공해야 함
+    """
+
+    def __init__(self, target, host="127.0.0.1", port=CONTROL_PORT):
+        self.target = target
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.script = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """제어 서버 시작 (바인드 실패 시 False)"""
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), _ControlHandler)
+        except OSError as e:
+            print(f"⚠️  제어 API 시작 실패: {e}")
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.control = self
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        print(f"🎛️  제어 API: http://{self.host}:{self.port}")
+        return True
+
+    def run_script(self, script: Dict[str, Any]) -> Dict[str, Any]:
+        """스크립트 실행 (실행 중인 스크립트는 중지 후 교체)"""
+        with self._lock:
+            if self.script:
+                self.script.stop()
+            self.script = ScriptRunner(script, self.target.apply_control,
+                                       getattr(self.target, "clock", None)).start()
+            return self.script.status()
+
+    def script_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return self.script.status() if self.script else {"running": False}
+
+    def stop_script(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.script:
+                self.script.stop()
+                self.script.wait(1.0)
+            return self.script.status() if self.script else {"running": False}
+
+    def stop(self):
+        if self.script:
+            self.script.stop()
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+
+def request(method: str, path: str, body: Any = None, host="127.0.0.1", port=CONTROL_PORT, timeout=5.0):
+    """제어 API 호출 -> (HTTP 상태, 응답 JSON)"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 테스트 서버 제어")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=CONTROL_PORT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("state", help="현재 제어 상태")
+    set_parser = sub.add_parser("set", help="상태 변경 (key=value ...)")
+    set_parser.add_argument("assignments", nargs="+")
+    run_parser = sub.add_parser("run", help="스크립트 파일 실행")
+    run_parser.add_argument("script")
+    sub.add_parser("status", help="스크립트 진행 상태")
+    sub.add_parser("stop", help="스크립트 중지")
+    profile_parser = sub.add_parser("profile", help="런타임 프로파일링")
+    profile_parser.add_argument("action", choices=("start", "stop", "status"))
+    profile_parser.add_argument("--mode", choices=PROFILE_MODES, default="sampling")
+    profile_parser.add_argument("--duration", type=float, default=None, help="초 (cprofile 기본 10초)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "state":
+            status, body = request("GET", "/state", host=args.host, port=args.port)
+        elif args.command == "set":
+            status, body = request("POST", "/command", parse_assignments(args.assignments),
+                                   host=args.host, port=args.port)
+        elif args.command == "run":
+            script = read_script_file(args.script)
+            parse_script(script)  # 보내기 전에 로컬에서 먼저 검증
+            status, body = request("POST", "/script", script, host=args.host, port=args.port)
+        elif args.command == "status":
+            status, body = request("GET", "/script", host=args.host, port=args.port)
+        elif args.command == "profile":
+            method = {"start": "POST", "stop": "DELETE", "status": "GET"}[args.action]
+            options = parse_profile({"mode": args.mode, "duration": args.duration}) \
+                if args.action == "start" else None
+            status, body = request(method, "/profile", options, host=args.host, port=args.port)
+        else:
+            status, body = request("DELETE", "/script", host=args.host, port=args.port)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+    except OSError as e:
+        print(f"❌ 제어 API 연결 실패: {e}")
+        raise SystemExit(1)
+
+    print(("✅ " if status < 400 else "❌ ") + json.dumps(body, ensure_ascii=False))
+    raise SystemExit(0 if status < 400 else 1)
+
+
+if __name__ == "__main__":
+    main()
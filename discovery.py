@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+CarrotView UDP 서버 탐색
+서브넷 전체를 TCP로 하나씩 두드리는 대신, 서버가 UDP 브로드캐스트/멀티캐스트
+탐색 요청에 응답하여 자신의 주소/포트/프로토콜 버전/기능을 알려줌
+
+요청: {"type": "carrotview_discover", "nonce": "..."}
+응답: {"type": "carrotview_announce", "nonce": "...", "host": "...", "port": 8080,
+       "protocol": "1.0", "name": "...", "capabilities": {...}}
+
+사용법
+  python discovery.py                 # 네트워크에서 서버 찾기
+  python discovery.py bench           # 루프백 탐색 vs TCP 서브넷 스캔 비교
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+
+DISCOVERY_PORT = 8081
+MULTICAST_GROUP = "239.255.80.80"
+PROTOCOL_VERSION = "1.0"
+
+DISCOVER_TYPE = "carrotview_discover"
+ANNOUNCE_TYPE = "carrotview_announce"
+
+
+def local_ip_for(peer_host: str) -> str:
+    """peer로 향하는 인터페이스의 로컬 IP (연결 없이 라우팅 테이블만 조회)"""
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect((peer_host, 9))
+            return s.getsockname()[0]
+        finally:
+            s.close()
+    except OSError:
+        return "127.0.0.1"
+
+
+class DiscoveryResponder:
+    """UDP 탐색 요청 응답기 (서버에 붙여서 실행)"""
+
+    def __init__(self, tcp_port: int, capabilities: Optional[Dict] = None,
+                 name="CarrotView", discovery_port=DISCOVERY_PORT, multicast_group=MULTICAST_GROUP):
+        self.tcp_port = tcp_port
+        self.capabilities = capabilities or {}
+        self.name = name
+        self.discovery_port = discovery_port
+        self.multicast_group = multicast_group
+        self.running = False
+        self.sock = None
+        self.requests = 0
+
+    def start(self):
+        """응답기 시작 (바인드 실패 시 False)"""
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(('', self.discovery_port))
+            self.sock.settimeout(1.0)
+        except OSError as e:
+            print(f"⚠️  탐색 응답기 시작 실패: {e}")
+            return False
+
+        # 멀티캐스트 그룹 가입 (지원하지 않는 환경이면 브로드캐스트만 사용)
+        try:
+            membership = struct.pack('4s4s', socket.inet_aton(self.multicast_group),
+                                     socket.inet_aton('0.0.0.0'))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError:
+            pass
+
+        self.running = True
+        threading.Thread(target=self._serve, daemon=True).start()
+        print(f"📡 탐색 응답기: UDP {self.discovery_port} (멀티캐스트 {self.multicast_group})")
+        return True
+
+    def _serve(self):
+        while self.running:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            try:
+                request = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(request, dict) or request.get("type") != DISCOVER_TYPE:
+                continue
+
+            self.requests += 1
+            announce = {
+                "type": ANNOUNCE_TYPE,
+                "nonce": request.get("nonce"),
+                "host": local_ip_for(address[0]),
+                "port": self.tcp_port,
+                "protocol": PROTOCOL_VERSION,
+                "name": self.name,
+                "capabilities": self.capabilities
+            }
+            try:
+                self.sock.sendto(json.dumps(announce).encode('utf-8'), address)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+
+
+def discover(timeout=1.0, first=False, targets: Optional[List[str]] = None,
+             discovery_port=DISCOVERY_PORT, multicast_group=MULTICAST_GROUP) -> List[Dict]:
+    """
+    서버 탐색 (브로드캐스트 + 멀티캐스트 + 지정 주소로 동시에 요청)
+    first=True면 첫 응답을 받는 즉시 반환
+    각 결과에는 응답까지 걸린 시간 rtt_ms가 포함됨
+    """
+    nonce = os.urandom(8).hex()
+    request = json.dumps({"type": DISCOVER_TYPE, "nonce": nonce}).encode('utf-8')
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+
+    start = time.perf_counter()
+    for host in ['<broadcast>', multicast_group] + list(targets or []):
+        try:
+            sock.sendto(request, (host, discovery_port))
+        except OSError:
+            pass  # 브로드캐스트/멀티캐스트 경로가 없는 환경
+
+    found = {}
+    deadline = start + timeout
+    try:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, address = sock.recvfrom(2048)
+            except socket.timeout:
+                break
+
+            try:
+                announce = json.loads(data)
+            except ValueError:
+                continue
+            if (not isinstance(announce, dict) or announce.get("type") != ANNOUNCE_TYPE
+                    or announce.get("nonce") != nonce):
+                continue
+
+            key = (announce.get("host"), announce.get("port"))
+            if key not in found:
+                announce["rtt_ms"] = (time.perf_counter() - start) * 1000
+                found[key] = announce
+                if first:
+                    break
+    finally:
+        sock.close()
+
+    return list(found.values())
+
+
+def is_carrotpilot_server(ip: str, port: int, timeout=0.8) -> bool:
+    """앱의 isCarrotPilotServer와 동일한 TCP 확인 (연결 후 4바이트 수신 여부)"""
+    try:
+        with socket.create_connection((ip, port), timeout=timeout) as s:
+            s.settimeout(timeout)
+            return len(s.recv(4)) == 4
+    except OSError:
+        return False
+
+
+def tcp_subnet_sweep(subnet: str, port: int, timeout=0.8, workers=64) -> Optional[str]:
+    """
+    앱의 findCarrotPilotInSubnet과 같은 순서/타임아웃(0.8초)의 서브넷 스캔 (비교용)
+    나머지 주소는 workers개 병렬 (기본 64 = 앱이 쓰는 Dispatchers.IO의 기본 스레드 한도, 기기에서는
+    그보다 느린 경우가 많으므로 낙관적인 기준선)
+    """
+    priority = [f"{subnet}.{i}" for i in (1, 100, 10, 254, 2)]
+    for ip in priority:
+        if is_carrotpilot_server(ip, port, timeout):
+            return ip
+
+    others = [f"{subnet}.{i}" for i in range(1, 255) if f"{subnet}.{i}" not in priority]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ip, ok in zip(others, pool.map(lambda ip: is_carrotpilot_server(ip, port, timeout), others)):
+            if ok:
+                return ip
+    return None
+
+
+def benchmark(tcp_port=18080, discovery_port=18081, rounds=20, sweep_subnet="10.255.255"):
+    """루프백에서 UDP 탐색과 TCP 서브넷 스캔 비교"""
+    from test_server import TestTCPServer
+
+    server = TestTCPServer(port=tcp_port, discovery_port=discovery_port)
+    server.start()
+    time.sleep(0.2)
+
+    try:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            results = discover(timeout=1.0, first=True, targets=["127.0.0.1"],
+                               discovery_port=discovery_port)
+            timings.append((time.perf_counter() - start) * 1000)
+            if not results:
+                print("❌ 탐색 응답 없음")
+                return
+        timings.sort()
+        print(f"\n📡 UDP 탐색 ({rounds}회): 중앙값 {timings[len(timings) // 2]:.2f}ms | 최대 {timings[-1]:.2f}ms")
+        print(f"   응답: {results[0]['host']}:{results[0]['port']} (프로토콜 {results[0]['protocol']}, "
+              f"기능 {results[0]['capabilities']})")
+
+        # 앱 방식 비교: 서버가 .1에 있는 루프백(최선) + 응답 없는 서브넷(앱이 순회하는 대역에서 흔한 경우)
+        for subnet in ("127.0.0", sweep_subnet):
+            start = time.perf_counter()
+            found = tcp_subnet_sweep(subnet, tcp_port)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"🔍 TCP 서브넷 스캔 {subnet}.0/24 (64개 병렬, 낙관적 기준선): {elapsed:.1f}ms (발견: {found})")
+            # 앱은 서버를 못 찾으면 로컬 서브넷 + 공통 사설 대역 7개를 차례로 스캔
+            if found is None:
+                print(f"   앱 전체 탐색 최악 추정 (서브넷 8개 순차): {elapsed * 8 / 1000:.1f}초")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView UDP 서버 탐색")
+    parser.add_argument("command", nargs="?", choices=("discover", "bench"), default="discover")
+    parser.add_argument("--port", type=int, default=DISCOVERY_PORT, help="탐색 UDP 포트")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--target", action="append", default=[], help="추가로 직접 요청할 주소")
+    parser.add_argument("--sweep-subnet", default="10.255.255", help="bench에서 비교할 서버 없는 /24 서브넷")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(sweep_subnet=args.sweep_subnet)
+        return
+
+    print("🔍 CarrotView 서버 탐색 중...")
+    results = discover(timeout=args.timeout, targets=args.target, discovery_port=args.port)
+    if not results:
+        print("❌ 서버를 찾지 못했습니다.")
+    for result in results:
+        print(f"✅ {result['name']} {result['host']}:{result['port']} "
+              f"(프로토콜 {result['protocol']}, {result['rtt_ms']:.1f}ms) {result['capabilities']}")
+
+
+if __name__ == "__main__":
+    main()
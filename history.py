@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+CarrotView 텔레메트리 히스토리 (백필)
+최근 N초의 인코딩된 프레임을 바이트 상한이 있는 링 버퍼에 보관하고, 재연결한 대시보드가
+인증 직후 그래프를 채울 수 있도록 압축된 배치 1개로 보내줌
+
+- 링 버퍼 : (seq, timestamp, 페이로드), 시간(seconds)과 페이로드 바이트 합(max_bytes) 중 먼저 닿는 쪽에서 오래된 것부터 제거
+- 백필 요청: 인증 응답에 "backfill": 초 (true면 보관 중인 전체)
+- 배치 : {"type": "backfill", "first_seq", "last_seq", "count", "frames": [...]} (클라이언트 포맷, 항상 gzip)
+           실시간 프레임은 last_seq + 1부터 이어짐 (스냅샷과 채널 등록은 틱 사이에서 한 번에,
+           배치 생성/압축은 상태 잠금 밖 클라이언트 송신 스레드에서)
+
+사용법
+  python history.py check        # 백필 + 실시간 전환 시 seq 누락/중복 확인, 배치 크기/메모리 상한 확인
+"""
+
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+from serializers import Serializer
+
+
+DEFAULT_HISTORY_SECONDS = 30.0
+DEFAULT_HISTORY_BYTES = 2 * 1024 * 1024  # 페이로드 합 기준
+
+
+class FrameHistory:
+    """최근 프레임 링 버퍼 (한 가지 포맷으로 보관, 다른 포맷 클라이언트에는 백필 시점에 변환)"""
+
+    def __init__(self, serializer: Serializer, seconds=DEFAULT_HISTORY_SECONDS, max_bytes=DEFAULT_HISTORY_BYTES):
+        self.serializer = serializer
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames = deque()  # (seq, timestamp_ms, payload)
+        self.bytes = 0
+        self.last_seq = 0  # 마지막으로 추가한 프레임 seq (비어 있어도 실시간 프레임 이어 붙이기 기준)
+        self.evicted_frames = 0
+        self._lock = threading.Lock()
+
+    def append(self, seq: int, timestamp_ms: int, payload: bytes):
+        """프레임 추가 후 시간/바이트 상한을 넘는 오래된 프레임 제거"""
+        with self._lock:
+            frames = self.frames
+            frames.append((seq, timestamp_ms, payload))
+            self.bytes += len(payload)
+            self.last_seq = seq
+            oldest = timestamp_ms - self.seconds * 1000
+            while frames and (self.bytes > self.max_bytes or frames[0][1] < oldest):
+                self.bytes -= len(frames.popleft()[2])
+                self.evicted_frames += 1
+
+    def snapshot(self, seconds: Optional[float] = None) -> List[Tuple[int, int, bytes]]:
+        """최근 seconds초 프레임 목록 (None이면 보관 중인 전체)"""
+        with self._lock:
+            frames = list(self.frames)
+        if seconds is not None and frames:
+            oldest = frames[-1][1] - seconds * 1000
+            frames = [frame for frame in frames if frame[1] >= oldest]
+        return frames
+
+    def build_backfill(self, frames: List[Tuple[int, int, bytes]], last_seq: int, serializer: Serializer) -> bytes:
+        """
+        백필 배치 페이로드 (serializer 포맷, last_seq는 snapshot 시점의 self.last_seq)
+        같은 JSON 계열 포맷이면 저장된 바이트를 그대로 이어 붙이고, 아니면 디코드 후 다시 인코딩
+        상태 잠금 밖(클라이언트 송신 스레드)에서 호출해도 되도록 버퍼 자체는 읽지 않음
+        """
+        header = {"type": "backfill", "first_seq": frames[0][0] if frames else None,
+                  "last_seq": last_seq, "count": len(frames)}
+        if serializer.name == self.serializer.name and serializer.supports_fragments:
+            # b'{...}' -> b'{..., "frames": [f1,f2,...]}'
+            return (serializer.encode(header)[:-1] + b', "frames": ['
+                    + b','.join(frame[2] for frame in frames) + b']}')
+        header["frames"] = [self.serializer.decode(frame[2]) for frame in frames]
+        return serializer.encode(header)
+
+    def stats(self):
+        with self._lock:
+            span = (self.frames[-1][1] - self.frames[0][1]) / 1000 if self.frames else 0.0
+            return {"frames": len(self.frames), "bytes": self.bytes, "seconds": span,
+                    "evicted": self.evicted_frames}
+
+
+def _connect(port, backfill, data_format=None):
+    """백필을 요청하는 프레임 클라이언트 (인증까지) -> (소켓, 프레임 읽기 함수)"""
+    from test_server import AUTH_TOKEN
+
+    sock = socket.create_connection(("127.0.0.1", port))
+    reader = sock.makefile('rb')
+
+    def read():
+        frame = reader.read(struct.unpack('>I', reader.read(4))[0])
+        return frame, (gzip.decompress(frame[1:]) if frame[0] == 0x01 else frame[1:])
+
+    request = json.loads(read()[1])
+    response = {"token": f"{AUTH_TOKEN}_{request['challenge']}", "backfill": backfill}
+    if data_format:
+        response["format"] = data_format
+    payload = json.dumps(response).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(payload)) + payload)
+    read()  # auth_success
+    return sock, read
+
+
+def check(warmup=2.0, live_frames=200, tick_interval=0.01):
+    """백필 배치 -> 실시간 프레임 전환 시 seq 연속성 확인 (포맷별, 틱 도중 연결 반복)"""
+    from serializers import get_serializer
+    from test_server import TestTCPServer
+
+    # 서버 로그는 버리고 결과만 출력
+    out = sys.stdout
+    devnull = open(os.devnull, 'w')
+    with devnull, contextlib.redirect_stdout(devnull):
+        server = TestTCPServer(port=0, discovery_port=None, tick_interval=tick_interval)
+        server.start()
+        server.apply_control({"speed": 20.0, "gear": "drive", "tracks": 8})
+        time.sleep(warmup)
+        print(f"\n🕘 히스토리 {server.history.seconds:g}초 / {server.history.max_bytes // 1024}KiB | "
+              f"{1 / tick_interval:.0f}Hz, {warmup:g}초 경과 후 연결", file=out)
+        ok = True
+        try:
+            for data_format in server.formats:
+                serializer = get_serializer(data_format)
+                for attempt in range(5):
+                    sock, read = _connect(server.port, True, data_format)
+                    frame, payload = read()
+                    batch = serializer.decode(payload)
+                    seqs = [item["seq"] for item in batch["frames"]]
+                    seqs += [serializer.decode(read()[1])["seq"] for _ in range(live_frames)]
+                    sock.close()
+                    expected = list(range(seqs[0], seqs[0] + len(seqs)))
+                    ok = ok and seqs == expected and batch["frames"][-1]["seq"] == batch["last_seq"]
+                    if attempt == 0:
+                        print(f"  {data_format:7s} 백필 {batch['count']}프레임 {len(payload) / 1024:6.1f}KiB -> "
+                              f"gzip {len(frame) / 1024:5.1f}KiB | 실시간 {live_frames}프레임 이어서 수신",
+                              file=out)
+                    time.sleep(tick_interval * attempt / 5)  # 틱 중간 여러 위치에서 연결
+
+            # 바이트 상한을 절반으로 줄이면 다음 틱부터 상한 안으로 들어옴
+            stats = server.history.stats()
+            server.history.max_bytes = stats["bytes"] // 2
+            time.sleep(tick_interval * 5)
+            capped = server.history.stats()
+            ok = ok and capped["bytes"] <= server.history.max_bytes
+            print(f"  상한 {stats['bytes'] // 1024}KiB -> {server.history.max_bytes // 1024}KiB: "
+                  f"{capped['frames']}프레임 {capped['bytes'] // 1024}KiB ({capped['seconds']:.1f}초)", file=out)
+        finally:
+            server.stop()
+
+    print("✅ seq 누락/중복 없음" if ok else "❌ seq 누락/중복 또는 상한 초과")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 텔레메트리 히스토리")
+    parser.add_argument("command", choices=("check",))
+    parser.parse_args()
+
+    raise SystemExit(0 if check() else 1)
+
+
+if __name__ == "__main__":
+    main()
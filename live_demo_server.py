@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 CarrotView 라이브 데모 서버 - 실시간 데이터 전송
+
+줄바꿈 구분 스트림: 첫 줄은 JSON hello, 이후 텔레메트리 프레임
+경고/상태 전환 이벤트 줄은 구독한 클라이언트에게만 ({"type": "subscribe", "events": true} 줄 전송)
 """
 
 import json
@@ -8,24 +11,42 @@ import time
 import socket
 import threading
 import random
+import argparse
+import contextlib
+import io
 from typing import Dict, Any, List
 
+from serializers import available_formats, get_serializer
+from telemetry_state import FrameEncoder, TelemetryState
+from client_channel import ClientChannel, StateEventDetector
+from discovery import DISCOVERY_PORT, DiscoveryResponder
+from sim_clock import SystemClock, VirtualClock
+from profiling import RuntimeProfiler
+from socket_tuning import (DEFAULT_SOCKET_PROFILE, SOCKET_PROFILES, apply_socket_profile,
+                           parse_socket_options, resolve_profile)
+
 
 class LiveCarrotPilotSimulator:
     """실시간 CarrotPilot 시뮬레이터"""
     
-    def __init__(self):
+    def __init__(self, clock=None, step=0.1, seed=None):
+        self.clock = clock or SystemClock()  # 프레임 timestamp 기준
+        self.step = step  # advance() 1회당 시나리오 진행 시간 (초)
+        self.random = random.Random(seed)
         self.speed = 0.0
         self.cruise_speed = 25.0
         self.autopilot_enabled = False
         self.gear = "park"
         self.steering_angle = 0.0
         self.battery = 85
+        self.scenario_tick = 0  # 정수 틱 (step 누적 시 부동소수점 오차가 쌓이지 않도록)
         self.scenario_time = 0
+        self.state = TelemetryState()
         
     def update_scenario(self):
         """시나리오 기반 데이터 업데이트"""
-        self.scenario_time += 0.1
+        self.scenario_tick += 1
+        self.scenario_time = self.scenario_tick * self.step
         
         # 시나리오 1: 정차 -> 출발 -> 자율주행 활성화
         if self.scenario_time < 10:
@@ -38,7 +59,7 @@ class LiveCarrotPilotSimulator:
             # 출발
             self.gear = "drive"
             self.speed = min(self.speed + 0.5, 15.0)  # 점진적 가속
-            self.steering_angle += random.uniform(-2, 2)
+            self.steering_angle += self.random.uniform(-2, 2)
             self.steering_angle = max(-30, min(30, self.steering_angle))
             
         elif self.scenario_time < 30:
@@ -56,19 +77,20 @@ class LiveCarrotPilotSimulator:
             
         elif self.scenario_time < 50:
             # 안정적인 자율주행
-            self.speed = self.cruise_speed + random.uniform(-1, 1)
-            self.steering_angle += random.uniform(-1, 1)
+            self.speed = self.cruise_speed + self.random.uniform(-1, 1)
+            self.steering_angle += self.random.uniform(-1, 1)
             self.steering_angle = max(-10, min(10, self.steering_angle))
             
         else:
             # 시나리오 리셋
+            self.scenario_tick = 0
             self.scenario_time = 0
             self.autopilot_enabled = False
             print("🔄 시나리오 리셋")
         
         # 배터리 소모 시뮬레이션
         if self.speed > 0:
-            self.battery -= 0.001
+            self.battery -= 0.01 * self.step
             self.battery = max(0, self.battery)
     
     def generate_live_tracks(self) -> List[Dict]:
@@ -77,26 +99,26 @@ class LiveCarrotPilotSimulator:
         
         # 자율주행 모드일 때 더 많은 차량 감지
         max_tracks = 8 if self.autopilot_enabled else 3
-        num_tracks = random.randint(0, max_tracks)
+        num_tracks = self.random.randint(0, max_tracks)
         
         for i in range(num_tracks):
             # 거리별 차량 분포
             if i == 0:  # 가장 가까운 차량
-                distance = random.uniform(15, 40)
+                distance = self.random.uniform(15, 40)
             else:
-                distance = random.uniform(20, 100)
+                distance = self.random.uniform(20, 100)
             
             tracks.append({
                 "trackId": i + 1,
                 "dRel": round(distance, 1),
-                "yRel": round(random.uniform(-3.5, 3.5), 1),
-                "vRel": round(random.uniform(-15, 10), 1)
+                "yRel": round(self.random.uniform(-3.5, 3.5), 1),
+                "vRel": round(self.random.uniform(-15, 10), 1)
             })
         
         return sorted(tracks, key=lambda x: x["dRel"])
     
-    def get_current_data(self) -> Dict[str, Any]:
-        """현재 상태 데이터 반환"""
+    def advance(self):
+        """한 틱 진행 후 상태 모델 갱신 (값이 바뀐 섹션만 변경 표시)"""
         self.update_scenario()
         
         # 경고 상태 결정
@@ -114,40 +136,50 @@ class LiveCarrotPilotSimulator:
                 alert_text = "자율주행 활성"
                 alert_status = "normal"
         
-        return {
-            "timestamp": int(time.time() * 1000),
-            "carState": {
-                "vEgo": round(self.speed, 2),
-                "vCruise": round(self.cruise_speed, 2),
-                "gearShifter": self.gear,
-                "doorOpen": False,
-                "seatbeltLatched": True,
-                "steeringAngleDeg": round(self.steering_angle, 1)
-            },
-            "controlsState": {
-                "enabled": self.autopilot_enabled,
-                "active": self.autopilot_enabled and self.speed > 5,
-                "alertText": alert_text,
-                "alertStatus": alert_status
-            },
-            "liveTracks": self.generate_live_tracks(),
-            "deviceState": {
-                "batteryPercent": int(self.battery),
-                "thermalStatus": "green" if self.battery > 20 else "yellow"
-            }
-        }
+        state = self.state
+        state.timestamp = self.clock.time_ms()
+        state.set_car_state(round(self.speed, 2), round(self.cruise_speed, 2), self.gear,
+                            False, True, round(self.steering_angle, 1))
+        state.set_controls_state(self.autopilot_enabled, self.autopilot_enabled and self.speed > 5,
+                                 alert_text, alert_status)
+        state.set_live_tracks(self.generate_live_tracks())
+        state.set_device_state(int(self.battery), "green" if self.battery > 20 else "yellow")
+    
+    def get_current_data(self) -> Dict[str, Any]:
+        """현재 상태 데이터 반환"""
+        self.advance()
+        return self.state.to_dict()
 
 
 class CarrotViewServer:
     """CarrotView 데이터 서버"""
     
-    def __init__(self, port=8080):
+    def __init__(self, port=8080, data_format=None, discovery_port=DISCOVERY_PORT, tick_interval=0.1,
+                 clock=None, seed=None, socket_profile=DEFAULT_SOCKET_PROFILE):
         self.port = port
+        self.tick_interval = tick_interval  # 기본 0.1초 (10Hz)
+        self.clock = clock or SystemClock()
         self.running = False
         self.clients = []
         self.server_socket = None
-        self.simulator = LiveCarrotPilotSimulator()
+        self.discovery_port = discovery_port  # None이면 UDP 탐색 응답 안 함
+        self.discovery = None
+        self.socket_options = resolve_profile(socket_profile)  # 수락한 클라이언트 소켓에 적용
+        self.simulator = LiveCarrotPilotSimulator(self.clock, step=tick_interval, seed=seed)
         self.data_count = 0
+        self.seq = 0  # 프레임 seq (시나리오가 처음부터 다시 시작해도 계속 증가)
+        
+        # 줄바꿈 구분 스트림이므로 텍스트 포맷만 사용 가능
+        self.serializer = get_serializer(data_format, ensure_ascii=False)
+        if self.serializer.binary:
+            raise ValueError(f"줄바꿈 구분 스트림에서 사용할 수 없는 포맷: {self.serializer.name}")
+        self.frame_encoder = FrameEncoder(self.serializer)
+        
+        # 경고/상태 전환 이벤트 (우선순위 레인으로 즉시 전송)
+        self.event_detector = StateEventDetector()
+        
+        # 런타임 프로파일링 (SIGUSR1/SIGUSR2로 켜고 끔)
+        self.profiler = RuntimeProfiler("CarrotViewServer")
         
     def start_server(self):
         """서버 시작"""
@@ -156,6 +188,7 @@ class CarrotViewServer:
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind(('0.0.0.0', self.port))
             self.server_socket.listen(5)
+            self.port = self.server_socket.getsockname()[1]  # port=0이면 임의 포트
             
             self.running = True
             
@@ -166,10 +199,20 @@ class CarrotViewServer:
             print("=" * 50)
             
             # 클라이언트 연결 처리 스레드
-            threading.Thread(target=self._accept_clients, daemon=True).start()
+            threading.Thread(target=self._accept_clients, name="accept", daemon=True).start()
             
             # 데이터 전송 스레드
-            threading.Thread(target=self._broadcast_data, daemon=True).start()
+            threading.Thread(target=self._broadcast_data, name="broadcast", daemon=True).start()
+            
+            # UDP 탐색 응답기
+            if self.discovery_port:
+                self.discovery = DiscoveryResponder(self.port, {
+                    "formats": [self.serializer.name],
+                    "events": True,
+                    "framing": "newline",
+                    "auth": None
+                }, name="CarrotView 라이브 데모 서버", discovery_port=self.discovery_port)
+                self.discovery.start()
             
             return True
             
@@ -182,29 +225,88 @@ class CarrotViewServer:
         while self.running:
             try:
                 client_socket, address = self.server_socket.accept()
-                self.clients.append(client_socket)
+                apply_socket_profile(client_socket, self.socket_options)
+                # 첫 줄은 항상 JSON 핸드셰이크 (이후 데이터 포맷 안내, 이벤트는 구독 요청 후부터)
+                hello = {"type": "hello", "format": self.serializer.name, "events": False}
+                client_socket.sendall(json.dumps(hello).encode('utf-8') + b'\n')
+                channel = ClientChannel(client_socket, address, self.serializer.name, events=False,
+                                        profiler=self.profiler, cork=self.socket_options.get("cork", False))
+                self.clients.append(channel)
+                threading.Thread(target=self._read_requests, args=(channel,),
+                                 name=f"client-recv-{address}", daemon=True).start()
                 print(f"📲 새 클라이언트 연결: {address[0]}:{address[1]}")
                 
             except Exception as e:
                 if self.running:
                     print(f"연결 오류: {e}")
     
+    def _read_requests(self, channel):
+        """클라이언트 요청 줄 수신 (현재는 이벤트 구독만, 요청을 보내지 않는 기존 클라이언트는 그대로)"""
+        buffer = b''
+        while channel.alive:
+            try:
+                chunk = channel.sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not chunk:
+                break
+            *lines, buffer = (buffer + chunk).split(b'\n')
+            for line in lines:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(request, dict) and request.get('type') == 'subscribe':
+                    channel.events = bool(request.get('events'))
+    
     def _broadcast_data(self):
         """데이터 브로드캐스트"""
         while self.running:
+            # 결정적 프로파일러는 이 스레드만 대상 (수락 스레드는 accept()에서 계속 막혀 있음)
             try:
-                # 실시간 데이터 생성
-                data = self.simulator.get_current_data()
-                json_data = json.dumps(data, ensure_ascii=False)
-                message = json_data.encode('utf-8') + b'\n'
+                if self.profiler.deterministic:
+                    self.profiler.checkpoint()
+                # 가상 시간은 클라이언트가 있을 때만 진행
+                if self.clock.virtual and not self.clients:
+                    time.sleep(0.01)
+                    continue
                 
-                # 모든 클라이언트에게 전송
+                stages = self.profiler.stages  # 프로파일링 중일 때만 단계별 시간 기록
+                if stages:
+                    started = time.perf_counter()
+                
+                # 실시간 데이터 생성 (변경된 섹션만 다시 인코딩)
+                self.simulator.advance()
+                state = self.simulator.state
+                self.seq += 1
+                state.seq = self.seq
+                
+                # 경고/상태 전환은 이벤트 프레임으로 텔레메트리보다 먼저 전송
+                events = self.event_detector.detect(state.controls_state, state.timestamp)
+                created = time.perf_counter()
+                if stages:
+                    stages.record("generate", created - started)
+                event_messages = [self.serializer.encode(event) + b'\n' for event in events]
+                
+                message = self.frame_encoder.encode(state) + b'\n'
+                if stages:
+                    encoded = time.perf_counter()
+                    stages.record("serialize", encoded - created)
+                
+                # 모든 클라이언트 송신 큐에 추가
                 disconnected_clients = []
                 for client in self.clients:
-                    try:
-                        client.send(message)
-                    except:
+                    if not client.alive:
                         disconnected_clients.append(client)
+                        continue
+                    if client.events:  # 구독한 클라이언트에게만
+                        for event_message in event_messages:
+                            client.send_event(event_message, created)
+                    client.send_telemetry(message)
+                if stages:
+                    stages.record("fan_out", time.perf_counter() - encoded)
                 
                 # 연결 끊어진 클라이언트 제거
                 for client in disconnected_clients:
@@ -216,9 +318,14 @@ class CarrotViewServer:
                 # 상태 출력 (5초마다)
                 self.data_count += 1
                 if self.data_count % 50 == 0:  # 10Hz * 5초
-                    self._print_status(data)
+                    self._print_status(self.simulator.state.to_dict())
                 
-                time.sleep(0.1)  # 10Hz 전송
+                # 가상 시간: 모든 클라이언트가 이번 틱을 받은 뒤에 시간 진행 (프레임 폐기 없음)
+                if self.clock.virtual:
+                    for client in list(self.clients):
+                        client.wait_drained(1.0)
+                
+                self.clock.sleep(self.tick_interval)
                 
             except Exception as e:
                 print(f"데이터 전송 오류: {e}")
@@ -236,9 +343,17 @@ class CarrotViewServer:
         
         if data['controlsState']['alertText']:
             print(f"⚠️  {data['controlsState']['alertText']}")
+        
+        # 클라이언트별 이벤트 전송 지연
+        for client in self.clients:
+            stats = client.event_latency.summary()
+            if stats['count']:
+                print(f"📨 {client.address[0]}:{client.address[1]} 이벤트 {stats['count']}건 | "
+                      f"p50 {stats['p50_ms']:.2f}ms | p95 {stats['p95_ms']:.2f}ms | 최대 {stats['max_ms']:.2f}ms")
     
     def stop_server(self):
         """서버 중지"""
+        self.profiler.stop()  # 프로파일링 중이었으면 결과 저장
         self.running = False
         
         for client in self.clients:
@@ -247,17 +362,75 @@ class CarrotViewServer:
         if self.server_socket:
             self.server_socket.close()
         
+        if self.discovery:
+            self.discovery.stop()
+        
         print("\n🛑 서버 중지됨")
 
 
+def record_session(path, duration, tick_interval=0.1, data_format=None, seed=None, clock=None):
+    """
+    소켓 없이 가상 시간으로 시나리오를 진행하며 줄바꿈 구분 프레임 파일 기록 (리플레이 생성용)
+    반환값: 기록한 프레임 수
+    """
+    clock = clock or VirtualClock()
+    simulator = LiveCarrotPilotSimulator(clock, step=tick_interval, seed=seed)
+    serializer = get_serializer(data_format, ensure_ascii=False)
+    if serializer.binary:
+        raise ValueError(f"줄바꿈 구분 파일에 사용할 수 없는 포맷: {serializer.name}")
+    frame_encoder = FrameEncoder(serializer)
+    
+    ticks = int(round(duration / tick_interval))
+    with open(path, 'wb') as f, contextlib.redirect_stdout(io.StringIO()):  # 시나리오 전환 출력 숨김
+        for tick in range(ticks):
+            simulator.advance()
+            simulator.state.seq = tick + 1
+            f.write(frame_encoder.encode(simulator.state) + b'\n')
+            clock.sleep(tick_interval)
+    return ticks
+
+
 def main():
     """메인 함수"""
+    parser = argparse.ArgumentParser(description="CarrotView 라이브 데모 서버")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--format", dest="data_format", default=None,
+                        choices=available_formats(text_only=True))
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT,
+                        help="UDP 탐색 응답 포트 (0이면 사용 안 함)")
+    parser.add_argument("--virtual", action="store_true",
+                        help="가상 시간 (틱을 기다리지 않고 클라이언트가 받는 속도로 진행)")
+    parser.add_argument("--seed", type=int, default=None, help="시나리오 난수 시드 (재현용)")
+    parser.add_argument("--record", default=None, metavar="FILE",
+                        help="서버 없이 가상 시간으로 --duration초 분량을 파일에 기록")
+    parser.add_argument("--duration", type=float, default=3600.0, help="--record 기록 시간 (초)")
+    parser.add_argument("--socket-profile", choices=list(SOCKET_PROFILES), default=DEFAULT_SOCKET_PROFILE,
+                        help="클라이언트 소켓 튜닝 프로파일")
+    parser.add_argument("--socket-option", action="append", default=[], metavar="KEY=VALUE",
+                        help="프로파일 옵션 덮어쓰기 (예: sndbuf=262144, keepalive=10,3,3)")
+    args = parser.parse_args()
+    try:
+        socket_options = resolve_profile(args.socket_profile, parse_socket_options(args.socket_option))
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.record:
+        start = time.perf_counter()
+        frames = record_session(args.record, args.duration, data_format=args.data_format, seed=args.seed)
+        print(f"📼 {args.record}: {frames}프레임 ({args.duration:g}초 분량) - "
+              f"{time.perf_counter() - start:.1f}초 소요")
+        return
+    
     print("🚗 CarrotView 라이브 데모 서버")
     print("=" * 50)
     
-    server = CarrotViewServer()
+    server = CarrotViewServer(port=args.port, data_format=args.data_format,
+                              discovery_port=args.discovery_port,
+                              clock=VirtualClock() if args.virtual else None, seed=args.seed,
+                              socket_profile=socket_options)
     
     if server.start_server():
+        server.profiler.install_signals()  # kill -USR1 <pid>: sampling, -USR2: cprofile
         print("\n📋 사용 방법:")
         print("1. 안드로이드 기기/에뮬레이터에서 CarrotView 앱 실행")
         print("2. 설정 → 서버 주소 입력:")
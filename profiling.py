@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+CarrotView 런타임 프로파일링
+서버를 재시작하지 않고 시그널/제어 명령으로 프로파일러를 켜고 끔 (꺼져 있을 때는 속성 확인 1회뿐)
+
+- sampling : 주기적으로 스레드 스택을 수집 (기본 broadcast/accept 스레드), 결과는 collapsed-stack (.folded)
+             flamegraph.pl / speedscope 에서 바로 열 수 있음
+- cprofile : 결정적 프로파일러, 지정한 시간 동안만 실행 (기본 10초), 결과는 pstats (.pstats)
+- 단계별 타이머: generate / serialize / fan_out / send / tick (두 모드 모두 기록, -stages.json)
+
+시그널 (POSIX)
+  SIGUSR1  sampling 켜기/끄기
+  SIGUSR2  cprofile 켜기/끄기
+
+사용법
+  python profiling.py bench       # 프로파일러 꺼짐/sampling/cprofile 별 서버 처리량 비교
+"""
+
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from client_channel import LatencyStats
+
+
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ("sampling", "cprofile")
+
+DEFAULT_SAMPLE_INTERVAL = 0.01    # 초 (100Hz)
+DEFAULT_CPROFILE_DURATION = 10.0  # 초, 결정적 프로파일러는 오버헤드가 커서 항상 시간 제한
+
+# sampling 기본 대상 (스레드 이름 접두사, 핸드셰이크 스레드는 "accept-<포트>")
+DEFAULT_THREADS = ("broadcast", "accept")
+
+
+class StageTimers:
+    """단계별 소요 시간 통계"""
+
+    def __init__(self):
+        self.stages: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        stats = self.stages.get(stage)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(stage, LatencyStats())
+        stats.record(seconds)
+
+    def wrap(self, stage: str, func):
+        """func 호출 시간을 stage로 기록하는 래퍼"""
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: stats.summary() for stage, stats in sorted(self.stages.items())}
+
+
+class RuntimeProfiler:
+    """
+    서버 1개의 런타임 프로파일러
+    hot path는 stages(None이면 꺼짐)와 deterministic(결정적 모드 전환 대기 여부)만 확인
+    """
+
+    def __init__(self, name="server", output_dir=PROFILE_DIR):
+        self.name = name
+        self.output_dir = output_dir
+        self.mode = None
+        self.stages: Optional[StageTimers] = None
+        self.deterministic = False  # 프로파일 대상 루프가 checkpoint()를 호출해야 하는지
+        self.started = None
+        self.last_outputs = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+        # sampling
+        self._sampler = None
+        self._sampling = threading.Event()
+        self._samples = Counter()
+        self._sample_count = 0
+
+        # cprofile (스레드별 Profile, 각 스레드가 checkpoint에서 직접 켜고 끔)
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._finished = set()  # disable까지 끝난 스레드
+        self._retired = []      # 프로파일 도중 끝난 짧은 스레드(핸드셰이크)의 Profile
+        self._profiles_lock = threading.Lock()  # 위 세 항목 (checkpoint/release 스레드와 _dump가 공유)
+        self._cprofile_active = False
+        self._pending = None    # stop() 후 아직 disable 안 된 스레드가 있을 때 (mode, stages, elapsed)
+
+    @property
+    def active(self) -> bool:
+        return self.mode is not None
+
+    def start(self, mode="sampling", duration=None, interval=DEFAULT_SAMPLE_INTERVAL,
+              threads=DEFAULT_THREADS) -> Dict:
+        """프로파일링 시작 (이미 실행 중이면 상태만 반환)"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"알 수 없는 프로파일 모드: {mode} ({', '.join(PROFILE_MODES)})")
+        with self._lock:
+            if self.active:
+                return self.status()
+            if mode == "cprofile" and duration is None:
+                duration = DEFAULT_CPROFILE_DURATION
+
+            self.mode = mode
+            self.started = time.perf_counter()
+            self.stages = StageTimers()
+            if mode == "sampling":
+                self._samples = Counter()
+                self._sample_count = 0
+                self._sampling.set()
+                self._sampler = threading.Thread(target=self._sample_loop, args=(interval, tuple(threads)),
+                                                 name="profiler-sampler", daemon=True)
+                self._sampler.start()
+            else:
+                self._profiles = {}
+                self._finished = set()
+                self._retired = []
+                self._cprofile_active = True
+                self.deterministic = True
+
+            if duration:
+                self._timer = threading.Timer(duration, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+            print(f"🔬 프로파일링 시작: {mode}" + (f" ({duration:g}초)" if duration else ""))
+            return self.status()
+
+    def stop(self) -> Dict:
+        """
+        프로파일링 종료 후 결과 파일 저장 (실행 중이 아니면 마지막 결과 반환)
+        cprofile은 모든 스레드가 Profile을 끈 뒤에 저장함. 2초 안에 못 끈 스레드가 있으면
+        deterministic을 유지한 채 반환하고, 마지막 스레드가 checkpoint/release에서 끌 때 저장
+        """
+        with self._lock:
+            if self._pending is not None:
+                if self._all_disabled():
+                    self._complete(*self._pending)
+                return self.status()
+            if not self.active:
+                return self.status()
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            mode, stages, elapsed = self.mode, self.stages, time.perf_counter() - self.started
+            self.stages = None
+
+            if mode == "sampling":
+                self._sampling.clear()
+                self._sampler.join(timeout=2.0)
+            else:
+                # 각 스레드가 다음 checkpoint에서 스스로 disable (최대 2초 대기)
+                self._cprofile_active = False
+                deadline = time.perf_counter() + 2.0
+                while not self._all_disabled() and time.perf_counter() < deadline:
+                    time.sleep(0.05)
+                with self._profiles_lock:
+                    if not self._all_disabled():
+                        self._pending = (mode, stages, elapsed)
+                        remaining = len(self._profiles) - len(self._finished)
+                if self._pending is not None:
+                    print(f"🔬 프로파일링 종료 대기: 스레드 {remaining}개가 아직 checkpoint에 도달하지 않음")
+                    return self.status()
+
+            self._complete(mode, stages, elapsed)
+            return self.status()
+
+    def _complete(self, mode, stages: StageTimers, elapsed: float):
+        """결과 저장 후 hot path 확인 해제 (self._lock 보유 상태에서 호출)"""
+        self.last_outputs = self._dump(mode, stages, elapsed)
+        self.mode = None
+        self.deterministic = False
+        self._pending = None
+        print(f"🔬 프로파일링 종료: {', '.join(self.last_outputs.values())}")
+
+    def _complete_pending(self):
+        with self._lock:
+            if self._pending is not None:
+                self._complete(*self._pending)
+
+    def _all_disabled(self) -> bool:
+        """켠 Profile이 모두 꺼졌는지 (이미 끝난 스레드는 더 기록하지 않으므로 꺼진 것으로 봄)"""
+        alive = {thread.ident for thread in threading.enumerate()}
+        return all(ident in self._finished or ident not in alive for ident in list(self._profiles))
+
+    def toggle(self, mode="sampling", **options) -> Dict:
+        return self.stop() if self.active else self.start(mode, **options)
+
+    def status(self) -> Dict:
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "stopping": self._pending is not None,
+            "elapsed": time.perf_counter() - self.started if self.active else 0.0,
+            "outputs": self.last_outputs,
+        }
+
+    def checkpoint(self):
+        """
+        프로파일 대상 루프가 반복마다 호출 (deterministic이 True일 때만)
+        결정적 프로파일러는 스레드별로 켜야 하므로 각 스레드가 여기서 직접 켜고 끔
+        """
+        ident = threading.get_ident()
+        profile = self._profiles.get(ident)
+        if self._cprofile_active:
+            if profile is None:
+                profile = cProfile.Profile()
+                with self._profiles_lock:
+                    self._profiles[ident] = profile
+                profile.enable()
+        elif profile is not None and ident not in self._finished:
+            profile.disable()
+            with self._profiles_lock:
+                self._finished.add(ident)
+                last = self._pending is not None and self._all_disabled()
+            if last:
+                self._dump_later()
+
+    def release(self):
+        """
+        짧게 사는 스레드(핸드셰이크)가 끝날 때 호출
+        이 스레드에서 켠 Profile을 끄고 결과에 포함 (스레드 ident가 재사용돼도 새 스레드는 다시 켜짐)
+        """
+        ident = threading.get_ident()
+        profile = self._profiles.get(ident)
+        if profile is not None and ident not in self._finished:
+            profile.disable()
+            with self._profiles_lock:
+                self._retired.append(self._profiles.pop(ident))
+                last = self._pending is not None and self._all_disabled()
+            if last:
+                self._dump_later()
+
+    def _dump_later(self):
+        # 파일 저장은 프로파일 대상 루프(브로드캐스트/핸드셰이크) 밖에서
+        threading.Thread(target=self._complete_pending, name="profiler-dump", daemon=True).start()
+
+    def _sample_loop(self, interval, threads):
+        # 샘플링 중에는 코드 객체 튜플만 세고, 문자열 변환은 저장할 때 한 번만
+        own = threading.get_ident()
+        while self._sampling.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == own or (threads and not name.startswith(threads)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.append(name.split('-')[0])
+                self._samples[tuple(stack)] += 1
+            self._sample_count += 1
+            time.sleep(interval)
+
+    @staticmethod
+    def _fold(stack) -> str:
+        """(최하위 코드 ... 최상위 코드, 스레드 이름) -> "스레드;파일:함수;..." """
+        *codes, thread = stack
+        return ';'.join([thread] + [f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                                    for code in reversed(codes)])
+
+    def _dump(self, mode, stages: StageTimers, elapsed: float) -> Dict[str, str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{mode}")
+        outputs = {}
+
+        if mode == "sampling":
+            outputs["folded"] = prefix + ".folded"
+            with open(outputs["folded"], 'w', encoding='utf-8') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{self._fold(stack)} {count}\n")
+        else:
+            with self._profiles_lock:
+                # 여기까지 오면 모든 Profile이 꺼졌거나 스레드가 이미 끝난 상태
+                profiles = list(self._profiles.values()) + self._retired
+            if profiles:
+                outputs["pstats"] = prefix + ".pstats"
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(outputs["pstats"])
+
+        report = {"mode": mode, "elapsed": elapsed, "stages": stages.summary()}
+        if mode == "sampling":
+            report["samples"] = self._sample_count
+        outputs["stages"] = prefix + "-stages.json"
+        with open(outputs["stages"], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return outputs
+
+    def install_signals(self):
+        """SIGUSR1 = sampling, SIGUSR2 = cprofile 토글 (지원하지 않는 OS면 무시, 메인 스레드에서 호출)"""
+        for name, mode in (("SIGUSR1", "sampling"), ("SIGUSR2", "cprofile")):
+            signum = getattr(signal, name, None)
+            if signum is None:
+                continue
+            # 파일 저장은 시그널 핸들러 밖(별도 스레드)에서
+            signal.signal(signum, lambda *_, mode=mode: threading.Thread(
+                target=self.toggle, args=(mode,), daemon=True).start())
+
+
+def print_pstats(path: str, limit=15):
+    """pstats 파일 상위 항목 출력 (누적 시간 기준)"""
+    pstats.Stats(path).sort_stats("cumulative").print_stats(limit)
+
+
+def benchmark(frames=3000, clients=4):
+    """가상 시간 서버 처리량: 프로파일러 꺼짐 vs sampling vs cprofile"""
+    import socket
+    import struct
+    import tempfile
+    from sim_clock import VirtualClock
+    from test_server import TestTCPServer, AUTH_TOKEN
+
+    def connect(port):
+        sock = socket.create_connection(("127.0.0.1", port))
+        reader = sock.makefile('rb')
+        read = lambda: reader.read(struct.unpack('>I', reader.read(4))[0])
+        request = json.loads(read()[1:])
+        payload = json.dumps({"token": f"{AUTH_TOKEN}_{request['challenge']}"}).encode('utf-8')
+        sock.sendall(struct.pack('>I', len(payload)) + payload)
+        read()
+        return sock, read
+
+    print(f"\n🔬 가상 시간 서버 {frames}프레임 x 클라이언트 {clients}개")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in (None, "sampling", "cprofile"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                server = TestTCPServer(port=0, discovery_port=None, clock=VirtualClock())
+                server.profiler.output_dir = tmp
+                server.start()
+                sessions = [connect(server.port) for _ in range(clients)]
+                if mode:
+                    server.profiler.start(mode, duration=0)
+                start = time.perf_counter()
+                readers = [threading.Thread(target=lambda read=read: [read() for _ in range(frames)])
+                           for _, read in sessions]
+                for thread in readers:
+                    thread.start()
+                for thread in readers:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                status = server.profiler.stop() if mode else {}
+                for sock, _ in sessions:
+                    sock.close()
+                server.stop()
+            line = f"  {mode or '꺼짐':9s} {frames / elapsed:8.0f} 프레임/초"
+            if mode:
+                with open(status["outputs"]["stages"], encoding='utf-8') as f:
+                    stages = json.load(f)["stages"]
+                line += " | " + " ".join(f"{stage} p50 {s['p50_ms'] * 1000:.0f}µs"
+                                         for stage, s in stages.items())
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 런타임 프로파일링")
+    parser.add_argument("command", choices=("bench", "show"))
+    parser.add_argument("path", nargs="?", help="show: pstats 파일")
+    parser.add_argument("--frames", type=int, default=3000)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print_pstats(args.path)
+    else:
+        benchmark(args.frames)
+
+
+if __name__ == "__main__":
+    main()
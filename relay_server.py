@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+CarrotView 릴레이(팬아웃) 서버
+기기(CarrotPilot 또는 test_server)에는 연결 1개만 유지하고, 받은 스트림을 여러 대시보드에 다시 전송
+기기의 CPU/발열 부담은 다운스트림 클라이언트 수와 무관하게 클라이언트 1개 분량으로 고정됨
+
+- 업스트림 : challenge/token 인증 1회, 끊기면 자동 재연결 (지수 백오프)
+- 다운스트림: test_server와 같은 프로토콜 (자체 토큰 인증, 포맷 협상, gzip 압축, UDP, 이벤트, 히스토리 백필,
+              liveTracks 예산)
+- 컨플레이션: 클라이언트별 대기 프레임 1개 (느린 클라이언트는 항상 최신 프레임만 받음),
+              max_hz 요청 시 그 빈도 이하로만 전송. 이벤트는 우선순위 레인으로 항상 전달
+
+사용법
+  python relay_server.py --upstream 192.168.0.10:8080 --port 8082
+  python relay_server.py bench --clients 50      # 직접 연결 vs 릴레이 경유 시 기기 부하 비교
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Callable
+
+from serializers import get_serializer
+from socket_tuning import SOCKET_PROFILES, parse_socket_options, resolve_profile
+from test_server import AUTH_TOKEN, TestTCPServer
+from track_lod import select_tracks
+
+
+# 업스트림에서 이 시간 동안 아무 프레임도 없으면 끊긴 것으로 보고 재연결
+UPSTREAM_IDLE_TIMEOUT = 5.0
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 10.0
+
+RELAY_PORT = 8082
+
+
+class UpstreamLink:
+    """업스트림 연결 1개 유지 (인증 + 수신 + 자동 재연결)"""
+
+    def __init__(self, host: str, port: int, on_telemetry: Callable, on_event: Callable,
+                 token=AUTH_TOKEN, data_format=None):
+        self.host = host
+        self.port = port
+        self.on_telemetry = on_telemetry  # (payload, data, data_format)
+        self.on_event = on_event          # (event)
+        self.token = token
+        self.data_format = data_format
+        self.serializer = get_serializer(data_format)
+        self.running = False
+        self.connected = False
+        self.sock = None
+
+        self.connections = 0
+        self.frames = 0
+        self.events = 0
+        self.received_bytes = 0
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while self.running:
+            try:
+                self._connect()
+                delay = RECONNECT_MIN_DELAY
+                self._receive()
+            except (OSError, ValueError) as e:
+                if self.running:
+                    print(f"⚠️  업스트림 오류: {e}")
+            finally:
+                self.connected = False
+                if self.sock:
+                    self.sock.close()
+            if self.running:
+                print(f"🔁 업스트림 재연결 대기 {delay:.1f}초")
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=UPSTREAM_IDLE_TIMEOUT)
+        request = json.loads(self._receive_frame())
+        if request.get('type') != 'auth_required':
+            raise ValueError(f"예상하지 못한 업스트림 메시지: {request.get('type')}")
+
+        response = {"token": f"{self.token}_{request['challenge']}", "timestamp": int(time.time()),
+                    "events": True}
+        if self.data_format:
+            response["format"] = self.data_format
+        payload = json.dumps(response).encode('utf-8')
+        self.sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+        result = json.loads(self._receive_frame())
+        if result.get('type') != 'auth_success':
+            raise ValueError("업스트림 인증 실패")
+        self.serializer = get_serializer(result.get('format'))
+        self.connections += 1
+        self.connected = True
+        print(f"🔗 업스트림 연결: {self.host}:{self.port} ({self.serializer.name})")
+
+    def _receive_exact(self, length: int) -> bytes:
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.sock.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("업스트림 연결 종료")
+            data += chunk
+        return bytes(data)
+
+    def _receive_frame(self) -> bytes:
+        """프레임 1개 수신 (압축 플래그 처리 후 페이로드 반환)"""
+        length = struct.unpack('>I', self._receive_exact(4))[0]
+        frame = self._receive_exact(length)
+        self.received_bytes += 4 + length
+        return gzip.decompress(frame[1:]) if frame[0] == 0x01 else frame[1:]
+
+    def _receive(self):
+        while self.running:
+            payload = self._receive_frame()
+            data = self.serializer.decode(payload)
+            if isinstance(data, dict) and data.get('type') == 'event':
+                self.events += 1
+                self.on_event(data)
+            else:
+                self.frames += 1
+                self.on_telemetry(payload, data, self.serializer.name)
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+
+def stamp_seq(data: dict, seq: int) -> dict:
+    """프레임에 릴레이 seq 기록 (기기 seq는 덮어씀, test_server 프레임처럼 timestamp 바로 뒤)"""
+    frame = {}
+    for key, value in data.items():
+        if key != "seq":
+            frame[key] = value
+        if key == "timestamp":
+            frame["seq"] = seq
+    frame.setdefault("seq", seq)
+    return frame
+
+
+class RelayServer(TestTCPServer):
+    """업스트림 1개 -> 다운스트림 N개 팬아웃 (다운스트림 인증/협상/압축/UDP는 TestTCPServer와 동일)"""
+
+    telemetry_backlog = 1  # 컨플레이션: 느린 클라이언트는 최신 프레임만
+
+    def __init__(self, upstream_host: str, upstream_port: int, port=RELAY_PORT, formats=None,
+                 discovery_port=None, auth_token=AUTH_TOKEN, upstream_token=AUTH_TOKEN,
+                 upstream_format=None, socket_profile=None):
+        super().__init__(port=port, formats=formats, discovery_port=discovery_port, auth_token=auth_token,
+                         socket_profile=socket_profile)
+        self.upstream = UpstreamLink(upstream_host, upstream_port, self.relay_telemetry, self.relay_event,
+                                     token=upstream_token, data_format=upstream_format)
+        self._frame_cond = threading.Condition()
+        self._latest = None  # (payload, data, data_format)
+        self.relayed_frames = 0
+
+    def start(self):
+        super().start()
+        self.upstream.start()
+
+    def relay_telemetry(self, payload, data, data_format):
+        """업스트림 텔레메트리 수신 (팬아웃 스레드가 가장 최신 것만 가져감)"""
+        with self._frame_cond:
+            self._latest = (payload, data, data_format)
+            self._frame_cond.notify()
+
+    def relay_event(self, event):
+        """업스트림 이벤트는 기다리지 않고 바로 우선순위 레인으로"""
+        self.send_events([event])
+
+    def broadcast_data(self):
+        """업스트림 프레임이 올 때마다 다운스트림 전체에 전송 (가장 최신 프레임만)"""
+        while self.running:
+            try:
+                if self.profiler.deterministic:
+                    self.profiler.checkpoint()
+                with self._frame_cond:
+                    if self._latest is None:
+                        self._frame_cond.wait(1.0)
+                    latest, self._latest = self._latest, None
+                if latest is not None:
+                    self.relay_frame(*latest)
+            except Exception as e:
+                print(f"릴레이 오류: {e}")
+
+    def relay_frame(self, payload, data, upstream_format):
+        """프레임 1개 팬아웃 (릴레이 seq를 붙여 포맷/예산별 한 번만 인코딩)"""
+        lod_frames = {}  # 예산 -> liveTracks LOD를 적용한 프레임 (예산별로 한 번만 선택)
+
+        def encode(data_format, track_budget=None):
+            if not isinstance(data, dict):
+                return payload
+            if track_budget is None:
+                return self.frame_encoders[data_format].serializer.encode(data)
+            frame = lod_frames.get(track_budget)
+            if frame is None:
+                frame = lod_frames[track_budget] = dict(
+                    data, liveTracks=select_tracks(data.get("liveTracks") or [], track_budget))
+            return self.frame_encoders[data_format].serializer.encode(frame)
+
+        stages = self.profiler.stages  # 프로파일링 중일 때만 단계별 시간 기록
+        if stages:
+            started = time.perf_counter()
+            encode = stages.wrap("serialize", encode)
+        # seq 부여 + 팬아웃 + 히스토리 기록은 백필 스냅샷(인증 직후)과 겹치지 않도록 상태 잠금 안에서
+        with self.state_lock:
+            if isinstance(data, dict):
+                # 기기는 seq를 보내지 않거나 재시작하면 처음부터 다시 세므로 릴레이가 자체 seq를 붙임
+                self.state.seq += 1
+                data = stamp_seq(data, self.state.seq)
+            disconnected = self.fan_out(encode)
+            if stages:
+                stages.record("fan_out", time.perf_counter() - started)
+            if self.history is not None and isinstance(data, dict):
+                self.history.append(data["seq"], data.get("timestamp", 0),
+                                    encode(self.history.serializer.name))
+        self.relayed_frames += 1
+        self.remove_clients(disconnected)
+
+    def print_status(self):
+        upstream = self.upstream
+        state = "✅ 연결" if upstream.connected else "❌ 끊김"
+        sent = sum(channel.sent_bytes for channel in self.clients)
+        print(f"📡 업스트림 {state} (연결 {upstream.connections}회) | 수신 {upstream.frames}프레임 "
+              f"{upstream.received_bytes / 1024:.0f}KiB | 다운스트림 {len(self.clients)}개 "
+              f"{sent / 1024:.0f}KiB")
+
+    def stop(self):
+        self.upstream.stop()
+        super().stop()
+
+
+def _parse_address(value: str):
+    host, _, port = value.rpartition(':')
+    return host or "127.0.0.1", int(port)
+
+
+def benchmark(clients=50, duration=5.0, tick_interval=0.02):
+    """test_server를 기기로 두고 직접 연결 vs 릴레이 경유 비교"""
+    from test_client import CarrotViewTestClient
+
+    def run(port, count):
+        connected = []
+        for i in range(count):
+            # 절반은 gzip, 1/5은 2Hz 대시보드
+            client = CarrotViewTestClient(port=port, protocol="framed", quiet=True,
+                                          compression="gzip" if i % 2 else None,
+                                          max_hz=2.0 if i % 5 == 0 else None)
+            if client.connect():
+                threading.Thread(target=client.receive_data, daemon=True).start()
+                connected.append(client)
+        time.sleep(duration)
+        return connected
+
+    results = []
+    for label, via_relay in (("직접 연결", False), ("릴레이 경유", True)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            device = TestTCPServer(port=0, discovery_port=None, tick_interval=tick_interval)
+            device.start()
+            device.apply_control({"speed": 20.0, "gear": "drive", "tracks": 12})
+            relay = None
+            if via_relay:
+                relay = RelayServer("127.0.0.1", device.port, port=0)
+                relay.start()
+                time.sleep(0.3)
+            connected = run(relay.port if relay else device.port, clients)
+            device_connections = len(device.clients)
+            device_bytes = sum(channel.sent_bytes for channel in device.clients)
+            received = sum(client.data_count for client in connected)
+            received_bytes = sum(client.received_bytes for client in connected)
+            for client in connected:
+                client.disconnect()
+            if relay:
+                relay.stop()
+            device.stop()
+        results.append((label, device_connections, device_bytes, len(connected), received, received_bytes))
+
+    print(f"\n🔀 다운스트림 {clients}개 | {1 / tick_interval:.0f}Hz | {duration:.0f}초")
+    for label, connections, device_bytes, connected, received, received_bytes in results:
+        print(f"  {label:8s} 기기 연결 {connections:3d}개 | 기기 송신 {device_bytes / duration / 1024:8.1f}KiB/s | "
+              f"클라이언트 {connected}개 수신 {received}프레임 {received_bytes / duration / 1024:8.1f}KiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 릴레이 서버")
+    parser.add_argument("command", nargs="?", choices=("serve", "bench"), default="serve")
+    parser.add_argument("--upstream", default="127.0.0.1:8080", help="기기 주소 host:port")
+    parser.add_argument("--upstream-token", default=AUTH_TOKEN)
+    parser.add_argument("--upstream-format", default=None, help="업스트림에 요청할 직렬화 포맷")
+    parser.add_argument("--port", type=int, default=RELAY_PORT)
+    parser.add_argument("--token", default=AUTH_TOKEN, help="다운스트림 인증 토큰")
+    parser.add_argument("--formats", nargs="+", default=None, help="다운스트림에 제공할 포맷")
+    parser.add_argument("--discovery-port", type=int, default=0,
+                        help="UDP 탐색 응답 포트 (기본 0: 사용 안 함, 기기와 같은 호스트면 충돌)")
+    parser.add_argument("--clients", type=int, default=50, help="bench 다운스트림 클라이언트 수")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--socket-profile", choices=list(SOCKET_PROFILES), default=None,
+                        help="다운스트림 소켓 튜닝 프로파일 (기본 latency)")
+    parser.add_argument("--socket-option", action="append", default=[], metavar="KEY=VALUE",
+                        help="프로파일 옵션 덮어쓰기 (예: sndbuf=262144, keepalive=10,3,3)")
+    args = parser.parse_args()
+    try:
+        socket_options = resolve_profile(args.socket_profile, parse_socket_options(args.socket_option))
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command == "bench":
+        benchmark(args.clients, args.duration)
+        return
+
+    host, port = _parse_address(args.upstream)
+    relay = RelayServer(host, port, port=args.port, formats=args.formats,
+                        discovery_port=args.discovery_port or None, auth_token=args.token,
+                        upstream_token=args.upstream_token, upstream_format=args.upstream_format,
+                        socket_profile=socket_options)
+    relay.start()
+    relay.profiler.install_signals()  # kill -USR1 <pid>: sampling, -USR2: cprofile
+    print(f"🔀 릴레이: {host}:{port} -> 포트 {relay.port}")
+
+    try:
+        while True:
+            time.sleep(5)
+            relay.print_status()
+    except KeyboardInterrupt:
+        pass
+    relay.stop()
+
+
+if __name__ == "__main__":
+    main()
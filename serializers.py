@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+CarrotView 직렬화 계층
+서버/클라이언트가 공통으로 사용하는 텔레메트리 인코더/디코더
+
+- json     : 표준 json.dumps와 바이트 단위로 동일한 출력 (C 스캐너 재사용 + 섹션 조각 API)
+             전체 프레임 인코딩 자체는 json.dumps 대비 ensure_ascii=True 약 1.0배, False 약 2.4배
+             (True는 json.dumps도 캐시된 기본 인코더를 쓰므로 차이가 거의 없음). 프레임 구조별 특화
+             인코더는 float repr 비용이 그대로라 1.3배 정도에 그쳐 두지 않았고, 틱당 비용 절감은
+             섹션 캐시(telemetry_state.FrameEncoder)와 orjson에서 얻음
+- orjson   : orjson 설치 시 사용 가능한 가속 JSON (공백 없는 압축 표현)
+- msgpack  : msgpack 설치 시 사용 가능한 바이너리 포맷 (길이 프리픽스 프레이밍 전용)
+"""
+
+import json
+import timeit
+from json.encoder import c_make_encoder, encode_basestring, encode_basestring_ascii
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+DEFAULT_FORMAT = "json"
+
+# 고정 텔레메트리 프레임 최상위 구조 (섹션 조각을 이어 붙여 프레임 완성)
+_FRAME_TEMPLATE = (
+    b'{"timestamp": %s, "seq": %s, "carState": %s, "controlsState": %s, '
+    b'"liveTracks": %s, "deviceState": %s}'
+)
+_COMPACT_FRAME_TEMPLATE = (
+    b'{"timestamp":%s,"seq":%s,"carState":%s,"controlsState":%s,'
+    b'"liveTracks":%s,"deviceState":%s}'
+)
+
+
+class Serializer:
+    """직렬화 인터페이스"""
+
+    name = ""
+    binary = False
+    supports_fragments = False  # encode_fragment/splice_frame 제공 여부
+
+    def encode(self, data: Any) -> bytes:
+        """객체를 전송용 바이트로 변환"""
+        raise NotImplementedError
+
+    def decode(self, payload) -> Any:
+        """수신 바이트를 객체로 변환"""
+        raise NotImplementedError
+
+
+class StdlibJsonSerializer(Serializer):
+    """표준 라이브러리 json 직렬화"""
+
+    name = "json"
+
+    def __init__(self, ensure_ascii=True):
+        self.ensure_ascii = ensure_ascii
+        # json.dumps(ensure_ascii=False)는 호출마다 JSONEncoder를 새로 만들므로 미리 생성
+        self._encoder = json.JSONEncoder(ensure_ascii=ensure_ascii)
+
+    def encode(self, data: Any) -> bytes:
+        return self._encoder.encode(data).encode('utf-8')
+
+    def decode(self, payload) -> Any:
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload).decode('utf-8')
+        return json.loads(payload)
+
+
+class TelemetryJsonSerializer(StdlibJsonSerializer):
+    """
+    텔레메트리 전용 JSON 인코더 (출력은 json.dumps와 바이트 단위로 동일)
+
+    json.dumps는 호출마다 JSONEncoder/C 스캐너를 새로 만들고 순환 참조 검사용
+    markers dict를 관리함. 텔레메트리 프레임은 순환이 없는 트리이므로 C 스캐너를
+    한 번만 만들어 재사용하고, 섹션 단위 조각(fragment)을 고정 템플릿에 이어 붙이는
+    API를 제공함 (섹션 캐시에서 사용)
+    """
+
+    def __init__(self, ensure_ascii=True):
+        super().__init__(ensure_ascii)
+        if c_make_encoder is None:
+            self._scan = None
+        else:
+            self._scan = c_make_encoder(
+                None,                                       # markers (순환 검사 안 함)
+                self._encoder.default,
+                encode_basestring_ascii if ensure_ascii else encode_basestring,
+                None,                                       # indent
+                ': ', ', ',                                 # json.dumps 기본 구분자
+                False,                                      # sort_keys
+                False,                                      # skipkeys
+                True                                        # allow_nan
+            )
+
+    supports_fragments = True
+
+    def encode_fragment(self, data: Any) -> bytes:
+        """임의의 하위 객체를 JSON 바이트 조각으로 인코딩"""
+        if self._scan is None:
+            return self._encoder.encode(data).encode('utf-8')
+        return ''.join(self._scan(data, 0)).encode('utf-8')
+
+    encode = encode_fragment
+
+    @staticmethod
+    def splice_frame(timestamp: bytes, seq: bytes, car_state: bytes, controls_state: bytes,
+                     live_tracks: bytes, device_state: bytes) -> bytes:
+        """인코딩된 섹션 조각들로 프레임 완성 (json.dumps 출력과 동일한 배치)"""
+        return _FRAME_TEMPLATE % (timestamp, seq, car_state, controls_state, live_tracks, device_state)
+
+
+class OrjsonSerializer(Serializer):
+    """orjson 가속 JSON (공백 없는 표현, UTF-8 원문 그대로)"""
+
+    name = "orjson"
+    supports_fragments = True
+
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    encode_fragment = encode
+
+    @staticmethod
+    def splice_frame(timestamp: bytes, seq: bytes, car_state: bytes, controls_state: bytes,
+                     live_tracks: bytes, device_state: bytes) -> bytes:
+        """인코딩된 섹션 조각들로 프레임 완성 (orjson 출력과 동일한 배치)"""
+        return _COMPACT_FRAME_TEMPLATE % (timestamp, seq, car_state, controls_state, live_tracks, device_state)
+
+    def decode(self, payload) -> Any:
+        return orjson.loads(payload)
+
+
+class MsgpackSerializer(Serializer):
+    """msgpack 바이너리 직렬화"""
+
+    name = "msgpack"
+    binary = True
+
+    def encode(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, payload) -> Any:
+        return msgpack.unpackb(payload, raw=False)
+
+
+def available_formats(text_only=False) -> List[str]:
+    """현재 환경에서 사용 가능한 포맷 목록 (선호 순서)"""
+    formats = [DEFAULT_FORMAT]
+    if orjson is not None:
+        formats.append(OrjsonSerializer.name)
+    if msgpack is not None and not text_only:
+        formats.append(MsgpackSerializer.name)
+    return formats
+
+
+def get_serializer(name: Optional[str] = None, ensure_ascii=True, fast_path=True) -> Serializer:
+    """포맷 이름으로 직렬화기 생성"""
+    name = name or DEFAULT_FORMAT
+    if name == DEFAULT_FORMAT:
+        if fast_path:
+            return TelemetryJsonSerializer(ensure_ascii=ensure_ascii)
+        return StdlibJsonSerializer(ensure_ascii=ensure_ascii)
+    if name == OrjsonSerializer.name and orjson is not None:
+        return OrjsonSerializer()
+    if name == MsgpackSerializer.name and msgpack is not None:
+        return MsgpackSerializer()
+    raise ValueError(f"지원하지 않는 직렬화 포맷: {name}")
+
+
+def negotiate_format(requested, supported: List[str]) -> str:
+    """클라이언트 요청 포맷 중 서버가 지원하는 첫 번째 포맷 선택 (없으면 json, 서버가 json을 안 쓰면 첫 번째 지원 포맷)"""
+    if isinstance(requested, str):
+        requested = [requested]
+    for name in requested or []:
+        if name in supported:
+            return name
+    return DEFAULT_FORMAT if DEFAULT_FORMAT in supported else supported[0]
+
+
+def benchmark(iterations=20000):
+    """틱당 인코딩 비용 측정 (stdlib json 대비)"""
+    from live_demo_server import LiveCarrotPilotSimulator
+
+    simulator = LiveCarrotPilotSimulator()
+    simulator.scenario_time = 35  # 자율주행 구간 (liveTracks 최대 8대)
+    simulator.autopilot_enabled = True
+    frames = [simulator.get_current_data() for _ in range(200)]
+    rounds = max(1, iterations // len(frames))
+
+    for ensure_ascii in (True, False):
+        baseline = None
+        print(f"\n=== ensure_ascii={ensure_ascii} ===")
+
+        candidates = [("json.dumps", lambda d: json.dumps(d, ensure_ascii=ensure_ascii).encode('utf-8'))]
+        for fmt in available_formats():
+            serializer = get_serializer(fmt, ensure_ascii=ensure_ascii)
+            candidates.append((f"{fmt} ({type(serializer).__name__})", serializer.encode))
+
+        reference = [json.dumps(d, ensure_ascii=ensure_ascii).encode('utf-8') for d in frames]
+        for label, encode in candidates:
+            def run():
+                for frame in frames:
+                    encode(frame)
+            best = min(timeit.repeat(run, number=rounds, repeat=5))
+            per_tick_us = best / (rounds * len(frames)) * 1e6
+            if baseline is None:
+                baseline = per_tick_us
+            identical = all(encode(d) == ref for d, ref in zip(frames, reference))
+            print(f"  {label:40s} {per_tick_us:7.2f} µs/tick  x{baseline / per_tick_us:4.1f}  "
+                  f"{'동일 바이트' if identical else '다른 바이트'}")
+    print("\n※ 전체 프레임 기준 비교 (json은 json.dumps와 같은 C 인코더라 배수가 작음), "
+          "섹션 캐시 효과는 python telemetry_state.py")
+
+
+def main():
+    print("🧪 CarrotView 직렬화 벤치마크")
+    print("=" * 50)
+    print(f"사용 가능한 포맷: {', '.join(available_formats())}")
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
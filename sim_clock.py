@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+CarrotView 시뮬레이션 시계
+시뮬레이터/스케줄러/타임스탬프가 time.time(), time.sleep()을 직접 쓰지 않고 주입된 시계를 사용
+
+- SystemClock : 실제 시간 (기본)
+- ScaledClock : rate배 빠르게 흐르는 시간 (실제 소켓으로 장시간 시나리오를 빨리 돌릴 때)
+- VirtualClock: 가상 시간, sleep()이 기다리지 않고 즉시 시간을 진행시킴
+                (시간을 진행시키는 스레드는 하나라고 가정 - 보통 서버 틱 루프)
+
+지연 측정(이벤트 지연, UDP 전송 지연 등)은 실제 성능을 재는 것이므로 계속 실제 시간을 사용
+
+사용법
+  python sim_clock.py bench            # 가상 시간으로 1시간 분량 생성/전송 소요 시간 측정
+"""
+
+import argparse
+import heapq
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable
+
+
+# 가상 시간 기본 시작 시각 (재현 가능한 타임스탬프, 2024-01-01 00:00:00 UTC)
+VIRTUAL_EPOCH = 1704067200.0
+
+
+class SystemClock:
+    """실제 시간"""
+
+    virtual = False
+    rate = 1.0
+
+    def time(self) -> float:
+        """epoch 기준 초"""
+        return time.time()
+
+    def time_ms(self) -> int:
+        """epoch 기준 밀리초 (프레임 timestamp)"""
+        return int(self.time() * 1000)
+
+    def monotonic(self) -> float:
+        """간격 계산용 초"""
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds / self.rate)
+
+    def call_at(self, when: float, callback: Callable[[], None]):
+        """monotonic() 기준 when에 callback 호출 (cancel() 가능한 핸들 반환)"""
+        timer = threading.Timer(max(0.0, (when - self.monotonic()) / self.rate), callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+class ScaledClock(SystemClock):
+    """rate배 빠르게 흐르는 시간 (sleep도 1/rate로 줄어듦)"""
+
+    def __init__(self, rate: float, start: float = None):
+        if rate <= 0:
+            raise ValueError("rate는 0보다 커야 합니다")
+        self.rate = rate
+        self._real_start = time.monotonic()
+        self._epoch = time.time() if start is None else start
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self._real_start) * self.rate
+
+    def time(self) -> float:
+        return self._epoch + self.monotonic()
+
+
+class _VirtualTimer:
+    __slots__ = ('callback', 'cancelled')
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+    """
+    가상 시간 (정수 마이크로초로 유지해 누적 오차 없음)
+    sleep()/advance()가 시간을 진행시키며, 그 사이에 예약된 call_at 콜백을 시각 순서대로
+    진행 중인 스레드에서 바로 실행함 (콜백 실행 시점의 시계는 정확히 예약 시각)
+    """
+
+    virtual = True
+    rate = float('inf')
+
+    def __init__(self, start: float = VIRTUAL_EPOCH):
+        self._epoch_us = round(start * 1_000_000)
+        self._now_us = 0
+        self._timers = []  # (시각 µs, 순번, 타이머)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return (self._epoch_us + self._now_us) / 1_000_000
+
+    def time_ms(self) -> int:
+        return (self._epoch_us + self._now_us) // 1000
+
+    def monotonic(self) -> float:
+        return self._now_us / 1_000_000
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        """시간 진행 (도중에 도래한 콜백 실행)"""
+        with self._lock:
+            target = self._now_us + max(0, round(seconds * 1_000_000))
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > target:
+                    self._now_us = target
+                    return
+                when, _, timer = heapq.heappop(self._timers)
+                self._now_us = max(self._now_us, when)
+            if not timer.cancelled:
+                timer.callback()
+
+    def call_at(self, when: float, callback: Callable[[], None]):
+        timer = _VirtualTimer(callback)
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._timers, (round(when * 1_000_000), self._seq, timer))
+        return timer
+
+
+def benchmark(hours=1.0, serve_minutes=10.0):
+    """가상 시간 생성/전송 속도 측정"""
+    from live_demo_server import record_session
+    from test_server import TestTCPServer
+    from test_client import AUTH_TOKEN
+
+    # 1) 라이브 시뮬레이터 세션 기록 (소켓 없음)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.jsonl")
+        start = time.perf_counter()
+        frames = record_session(path, hours * 3600, seed=1)
+        elapsed = time.perf_counter() - start
+        with open(path, 'rb') as f:
+            stamps = [json.loads(line)["timestamp"] for line in f]
+    steps = {b - a for a, b in zip(stamps, stamps[1:])}
+    print(f"\n📼 기록: 가상 {hours:g}시간 ({frames}프레임) -> {elapsed:.1f}초 "
+          f"({hours * 3600 / elapsed:.0f}배속) | 프레임 간격 {sorted(steps)}ms")
+
+    # 2) 가상 시간 서버 -> 루프백 클라이언트 (프레임 폐기 없이 전부 전송)
+    clock = VirtualClock()
+    server = TestTCPServer(port=0, discovery_port=None, clock=clock)
+    server.start()
+    try:
+        sock = socket.create_connection(("127.0.0.1", server.port))
+        reader = sock.makefile('rb')
+
+        def read_frame():
+            return reader.read(struct.unpack('>I', reader.read(4))[0])[1:]
+
+        request = json.loads(read_frame())
+        payload = json.dumps({"token": f"{AUTH_TOKEN}_{request['challenge']}"}).encode('utf-8')
+        sock.sendall(struct.pack('>I', len(payload)) + payload)
+        read_frame()  # auth_success
+
+        expected = int(serve_minutes * 60 / server.tick_interval)
+        start = time.perf_counter()
+        stamps = [json.loads(read_frame())["timestamp"] for _ in range(expected)]
+        elapsed = time.perf_counter() - start
+        sock.close()
+    finally:
+        server.stop()
+    steps = {b - a for a, b in zip(stamps, stamps[1:])}
+    print(f"📡 전송: 가상 {serve_minutes:g}분 ({len(stamps)}프레임) -> {elapsed:.1f}초 "
+          f"({serve_minutes * 60 / elapsed:.0f}배속) | 프레임 간격 {sorted(steps)}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 시뮬레이션 시계")
+    parser.add_argument("command", choices=("bench",))
+    parser.add_argument("--hours", type=float, default=1.0, help="기록할 가상 시간")
+    parser.add_argument("--serve-minutes", type=float, default=10.0, help="전송할 가상 시간")
+    args = parser.parse_args()
+
+    benchmark(args.hours, args.serve_minutes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+CarrotView 장시간 안정성(soak) 시험
+서버를 같은 프로세스에서 가속 시간(ScaledClock)으로 실행하고, 지속 연결 부하 클라이언트와
+연결/해제를 반복하는 클라이언트를 붙인 채 아래 항목을 주기적으로 샘플링함
+
+- RSS, tracemalloc 추적 메모리 (+ 증가량 상위 할당 위치)
+- 열린 파일 디스크립터 수, 스레드 수, 서버의 clients 목록 길이
+- 틱 지터 (관측 클라이언트 기준 프레임 도착 간격 - 틱 간격, p95)
+
+워밍업 이후 구간을 셋으로 나눠 중앙값이 계속 증가하고 허용치를 넘으면 실패 (종료 코드 1)
+외부 서비스 없이 루프백에서만 동작
+
+사용법
+  python soak_test.py                                   # test_server, 60초 x 10배속
+  python soak_test.py --server live --duration 600 --speedup 20
+"""
+
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import random
+import socket
+import statistics
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from serializers import get_serializer
+from sim_clock import ScaledClock
+from test_client import AUTH_TOKEN, CarrotViewTestClient
+
+
+# 워밍업 이후 처음 1/3 대비 마지막 1/3 중앙값 증가 허용치
+GROWTH_LIMITS = {
+    "rss_mb": 16.0,
+    "traced_mb": 4.0,
+    "fds": 8,
+    "threads": 8,
+    "server_clients": 4,
+    "jitter_p95_ms": 20.0,
+}
+
+# 연결 반복 방식
+CHURN_MODES = ("graceful", "abort", "silent", "stall")
+
+# 인증/hello 없이 붙잡고 있는 시간 (실제 시간, 다른 연결의 수락이 막히면 연결 실패로 드러남)
+SILENT_HOLD = (0.5, 3.0)
+
+
+def read_rss_mb() -> Optional[float]:
+    """현재 RSS (MB), /proc이 없으면 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def count_open_fds() -> Optional[int]:
+    """열린 파일 디스크립터 수, 지원하지 않는 OS면 None"""
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+
+def open_session(port: int, framed: bool, timeout=2.0) -> Tuple[socket.socket, str]:
+    """연결 + 핸드셰이크 (framed: challenge 인증, newline: hello 줄 수신) -> (소켓, 협상된 포맷)"""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    if framed:
+        header = _recv_exact(sock, 4)
+        request = json.loads(_recv_exact(sock, struct.unpack('>I', header)[0])[1:])
+        payload = json.dumps({"token": f"{AUTH_TOKEN}_{request['challenge']}"}).encode('utf-8')
+        sock.sendall(struct.pack('>I', len(payload)) + payload)
+        header = _recv_exact(sock, 4)
+        hello = json.loads(_recv_exact(sock, struct.unpack('>I', header)[0])[1:])  # auth_success
+    else:
+        line = b''
+        while not line.endswith(b'\n'):
+            chunk = sock.recv(1)
+            if not chunk:
+                raise ConnectionError("hello 수신 전 연결 종료")
+            line += chunk
+        hello = json.loads(line)
+    return sock, hello.get("format") or "json"
+
+
+def _recv_exact(sock: socket.socket, length: int) -> bytes:
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise ConnectionError("연결 종료")
+        data += chunk
+    return data
+
+
+class JitterProbe:
+    """관측 클라이언트: 텔레메트리 프레임 도착 간격 기록"""
+
+    def __init__(self, port: int, framed: bool, tick_interval: float):
+        self.sock, data_format = open_session(port, framed)
+        self.serializer = get_serializer(data_format)
+        self.sock.settimeout(1.0)
+        self.framed = framed
+        self.tick_interval = tick_interval
+        self.running = True
+        self._lock = threading.Lock()
+        self._deviations = []
+        self.frames = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        reader = self.sock.makefile('rb')
+        last = None
+        while self.running:
+            try:
+                if self.framed:
+                    frame = reader.read(struct.unpack('>I', reader.read(4))[0])
+                    payload = gzip.decompress(frame[1:]) if frame[:1] == b'\x01' else frame[1:]
+                else:
+                    frame = payload = reader.readline()
+                if not frame:
+                    break
+                # 이벤트는 틱 간격과 무관하므로 제외 (협상된 포맷으로 디코드해서 판별)
+                message = self.serializer.decode(payload)
+                if isinstance(message, dict) and message.get("type") == "event":
+                    continue
+            except (OSError, ValueError, struct.error):
+                break
+
+            now = time.perf_counter()
+            self.frames += 1
+            if last is not None:
+                with self._lock:
+                    self._deviations.append(abs(now - last - self.tick_interval))
+            last = now
+
+    def take_p95_ms(self) -> float:
+        """마지막 호출 이후 지터 p95 (ms)"""
+        with self._lock:
+            deviations, self._deviations = self._deviations, []
+        if not deviations:
+            return 0.0
+        deviations.sort()
+        return deviations[min(len(deviations) - 1, int(0.95 * len(deviations)))] * 1000
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+
+
+class ChurnWorker:
+    """연결 -> (정상 종료 | RST 종료 | 인증 없이 방치 | 수신 없이 방치) 반복"""
+
+    def __init__(self, port: int, framed: bool, tick_interval: float, seed: int):
+        self.port = port
+        self.framed = framed
+        self.tick_interval = tick_interval
+        self.random = random.Random(seed)
+        self.running = True
+        self.cycles = {mode: 0 for mode in CHURN_MODES}
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self.running:
+            mode = self.random.choice(CHURN_MODES)
+            hold = self.random.uniform(1, 20) * self.tick_interval
+            try:
+                self._cycle(mode, hold)
+                self.cycles[mode] += 1
+            except OSError:
+                self.errors += 1
+
+    def _cycle(self, mode: str, hold: float):
+        if mode == "silent":
+            # 연결만 하고 아무것도 하지 않음 (인증 대기 중인 서버가 막히면 안 됨)
+            sock = socket.create_connection(("127.0.0.1", self.port), timeout=2.0)
+            time.sleep(self.random.uniform(*SILENT_HOLD))
+            sock.close()
+            return
+
+        sock, _ = open_session(self.port, self.framed)
+        try:
+            if mode == "stall":
+                time.sleep(hold)  # 수신하지 않음 (서버 송신 버퍼가 쌓임)
+                return
+            deadline = time.perf_counter() + hold
+            while time.perf_counter() < deadline:
+                if not sock.recv(65536):
+                    break
+            if mode == "abort":
+                # SO_LINGER 0 -> RST로 즉시 종료
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        finally:
+            sock.close()
+
+    def stop(self):
+        self.running = False
+        self._thread.join(timeout=5)
+
+
+def start_server(kind: str, speedup: float):
+    """같은 프로세스에서 서버 시작 (임의 포트, UDP 탐색 없음, speedup배 빠른 시계)"""
+    clock = ScaledClock(speedup)
+    if kind == "live":
+        from live_demo_server import CarrotViewServer
+        server = CarrotViewServer(port=0, discovery_port=None, clock=clock)
+        if not server.start_server():
+            raise RuntimeError("라이브 데모 서버 시작 실패")
+        return server, server.stop_server, False
+
+    from test_server import TestTCPServer
+    server = TestTCPServer(port=0, discovery_port=None, clock=clock)
+    server.start()
+    return server, server.stop, True
+
+
+def detect_growth(samples: List[Dict], warmup=0.2) -> List[Dict]:
+    """워밍업 이후 구간을 셋으로 나눠 중앙값이 단조 증가하고 허용치를 넘는 항목"""
+    steady = samples[int(len(samples) * warmup):]
+    if len(steady) < 6:
+        return []
+
+    failures = []
+    for metric, limit in GROWTH_LIMITS.items():
+        values = [sample[metric] for sample in steady if sample.get(metric) is not None]
+        if len(values) < 6:
+            continue
+        third = len(values) // 3
+        first, middle, last = (statistics.median(values[:third]),
+                               statistics.median(values[third:-third]),
+                               statistics.median(values[-third:]))
+        if last - first > limit and first <= middle <= last:
+            failures.append({"metric": metric, "first": first, "last": last, "limit": limit})
+    return failures
+
+
+def soak(server_kind="test", duration=60.0, speedup=10.0, clients=8, churn_workers=4,
+         sample_interval=1.0, top=10, verbose=False) -> bool:
+    """soak 시험 실행 (통과 시 True)"""
+    tick_interval = 0.1 / speedup  # 실제 시간 기준 틱 간격
+    out = sys.stdout
+
+    # 서버 로그(연결/해제마다 출력)는 verbose가 아니면 버림 (메모리에 쌓으면 측정이 오염됨)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(out if verbose else devnull):
+        tracemalloc.start(25)
+        server, stop_server, framed = start_server(server_kind, speedup)
+        protocol = "framed" if framed else "newline"
+        load_clients = []
+        for _ in range(clients):
+            client = CarrotViewTestClient(port=server.port, protocol=protocol, quiet=True)
+            if client.connect():
+                threading.Thread(target=client.receive_data, daemon=True).start()
+                load_clients.append(client)
+        probe = JitterProbe(server.port, framed, tick_interval)
+        workers = [ChurnWorker(server.port, framed, tick_interval, seed) for seed in range(churn_workers)]
+
+        print(f"🧪 soak: {server_kind} 서버 | {duration:.0f}초 x {speedup:g}배속 "
+              f"(시뮬레이션 {duration * speedup / 60:.1f}분, 틱 {tick_interval * 1000:.1f}ms) | "
+              f"부하 {len(load_clients)}개 + 반복 연결 {churn_workers}개", file=out)
+
+        samples = []
+        baseline_snapshot = None
+        warmup_samples = max(1, int(duration / sample_interval * 0.2))
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < duration:
+                time.sleep(sample_interval)
+                traced, _ = tracemalloc.get_traced_memory()
+                sample = {
+                    "t": time.perf_counter() - start,
+                    "rss_mb": read_rss_mb(),
+                    "traced_mb": traced / (1024 * 1024),
+                    "fds": count_open_fds(),
+                    "threads": threading.active_count(),
+                    "server_clients": len(server.clients),
+                    "jitter_p95_ms": probe.take_p95_ms(),
+                }
+                samples.append(sample)
+                if len(samples) == warmup_samples:
+                    baseline_snapshot = tracemalloc.take_snapshot()
+                if verbose:
+                    print(_format_sample(sample), file=out)
+            final_snapshot = tracemalloc.take_snapshot()
+        finally:
+            for worker in workers:
+                worker.stop()
+            probe.close()
+            for client in load_clients:
+                client.disconnect()
+            stop_server()
+            tracemalloc.stop()
+
+    cycles = {mode: sum(worker.cycles[mode] for worker in workers) for mode in CHURN_MODES}
+    connect_errors = sum(worker.errors for worker in workers)
+    print(f"🔁 반복 연결: {sum(cycles.values())}회 {cycles} | 오류 {connect_errors}회 | "
+          f"관측 프레임 {probe.frames}개")
+    if samples:
+        print(f"📈 처음: {_format_sample(samples[0])}")
+        print(f"📈 마지막: {_format_sample(samples[-1])}")
+
+    if baseline_snapshot is not None:
+        print(f"🔬 워밍업 이후 증가 상위 {top}개 할당 위치:")
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = final_snapshot.filter_traces(filters).compare_to(
+            baseline_snapshot.filter_traces(filters), 'lineno')
+        for stat in diff[:top]:
+            frame = stat.traceback[0]
+            print(f"   {stat.size_diff / 1024:+8.1f}KiB {stat.count_diff:+6d}개  "
+                  f"{os.path.basename(frame.filename)}:{frame.lineno}")
+
+    failures = detect_growth(samples)
+    for failure in failures:
+        print(f"❌ {failure['metric']} 계속 증가: {failure['first']:.1f} -> {failure['last']:.1f} "
+              f"(허용 {failure['limit']})")
+    if connect_errors:
+        print(f"❌ 연결/핸드셰이크 실패 {connect_errors}회 (수락이 막혔거나 세션이 끊김)")
+    ok = not failures and not connect_errors
+    if ok:
+        print("✅ 모든 항목 안정")
+    return ok
+
+
+def _format_sample(sample: Dict) -> str:
+    rss = f"{sample['rss_mb']:.1f}MB" if sample['rss_mb'] is not None else "-"
+    return (f"{sample['t']:6.1f}s | RSS {rss} | traced {sample['traced_mb']:.2f}MB | "
+            f"FD {sample['fds']} | 스레드 {sample['threads']} | 서버 clients {sample['server_clients']} | "
+            f"지터 p95 {sample['jitter_p95_ms']:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 장시간 안정성 시험")
+    parser.add_argument("--server", choices=("test", "live"), default="test")
+    parser.add_argument("--duration", type=float, default=60.0, help="실제 실행 시간 (초)")
+    parser.add_argument("--speedup", type=float, default=10.0, help="시간 가속 배율 (틱 간격 = 0.1초 / 배율)")
+    parser.add_argument("--clients", type=int, default=8, help="지속 연결 부하 클라이언트 수")
+    parser.add_argument("--churn", type=int, default=4, help="연결/해제 반복 워커 수")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--verbose", action="store_true", help="서버 로그와 샘플 출력")
+    args = parser.parse_args()
+
+    ok = soak(args.server, args.duration, args.speedup, args.clients, args.churn,
+              args.sample_interval, verbose=args.verbose)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+CarrotView 소켓 튜닝 프로파일
+리스너(서버)별로 프로파일을 정해 수락한 클라이언트 소켓에 적용
+
+옵션
+  nodelay        TCP_NODELAY (Nagle 끄기, 작은 프레임 즉시 전송)
+  sndbuf/rcvbuf  SO_SNDBUF / SO_RCVBUF (바이트, 지정하면 커널 자동 조정이 꺼짐)
+  keepalive      (idle, interval, count) 초/초/횟수 - 응답 없는 기기를 idle + interval * count 초 안에 정리
+  notsent_lowat  TCP_NOTSENT_LOWAT (커널에 쌓이는 미전송 바이트 상한, 느린 클라이언트도 최신 프레임 위주로)
+  cork           TCP_CORK/TCP_NOPUSH (송신 큐에 프레임이 더 있으면 모아서 한 번에 내보냄, ClientChannel이 처리)
+
+지원하지 않는 OS 옵션은 건너뜀 (apply_socket_profile 반환값에 실제 적용된 것만 포함)
+
+사용법
+  python test_server.py --socket-profile latency --socket-option sndbuf=262144
+  python socket_tuning.py bench     # 루프백에서 프로파일별 지연/처리량 비교
+"""
+
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+
+SOCKET_PROFILES = {
+    # OS 기본값 (Nagle 켜짐, 버퍼 자동 조정, keepalive 없음)
+    "default": {},
+    # 실시간 대시보드: 작은 프레임 즉시 전송, 커널 미전송 큐는 짧게, 끊긴 폰은 약 19초 안에 정리
+    "latency": {"nodelay": True, "notsent_lowat": 16 * 1024, "keepalive": (10, 3, 3)},
+    # 기록/릴레이 대량 전송: 큰 버퍼 + 코르크로 밀린 프레임을 큰 세그먼트로
+    "throughput": {"sndbuf": 1024 * 1024, "rcvbuf": 256 * 1024, "cork": True, "keepalive": (60, 10, 5)},
+}
+DEFAULT_SOCKET_PROFILE = "latency"
+
+# 옵션 -> 타입 (keepalive는 정수 3개)
+SOCKET_OPTIONS = {"nodelay": bool, "sndbuf": int, "rcvbuf": int, "keepalive": tuple,
+                  "notsent_lowat": int, "cork": bool}
+
+# Linux TCP_CORK, BSD/macOS TCP_NOPUSH
+_CORK_OPTION = getattr(socket, "TCP_CORK", None) or getattr(socket, "TCP_NOPUSH", None)
+# Linux TCP_KEEPIDLE, macOS TCP_KEEPALIVE
+_KEEPIDLE_OPTION = getattr(socket, "TCP_KEEPIDLE", None) or getattr(socket, "TCP_KEEPALIVE", None)
+
+
+def resolve_profile(profile: Union[str, Dict[str, Any], None],
+                    overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """프로파일 이름 또는 옵션 dict -> 검증된 옵션 dict (overrides가 우선)"""
+    if profile is None:
+        profile = DEFAULT_SOCKET_PROFILE
+    if isinstance(profile, str):
+        if profile not in SOCKET_PROFILES:
+            raise ValueError(f"알 수 없는 소켓 프로파일: {profile} ({', '.join(SOCKET_PROFILES)})")
+        profile = SOCKET_PROFILES[profile]
+    options = dict(profile, **(overrides or {}))
+
+    for name, value in options.items():
+        kind = SOCKET_OPTIONS.get(name)
+        if kind is None:
+            raise ValueError(f"알 수 없는 소켓 옵션: {name} ({', '.join(SOCKET_OPTIONS)})")
+        if kind is int and (isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+            raise ValueError(f"{name}는 양의 정수여야 합니다")
+        if kind is bool and not isinstance(value, bool):
+            raise ValueError(f"{name}는 true/false여야 합니다")
+        if kind is tuple and value is not None and (
+                len(value) != 3 or not all(isinstance(v, int) and v > 0 for v in value)):
+            raise ValueError(f"{name}는 (idle, interval, count) 양의 정수 3개여야 합니다")
+    return options
+
+
+def parse_socket_options(assignments: List[str]) -> Dict[str, Any]:
+    """CLI key=value 목록 -> 옵션 dict (keepalive=idle,interval,count / off)"""
+    options = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition('=')
+        if not sep or name not in SOCKET_OPTIONS:
+            raise ValueError(f"잘못된 소켓 옵션: {assignment} ({', '.join(SOCKET_OPTIONS)})")
+        kind = SOCKET_OPTIONS[name]
+        try:
+            if kind is bool:
+                options[name] = {"true": True, "false": False, "1": True, "0": False}[value.lower()]
+            elif kind is tuple:
+                options[name] = None if value == "off" else tuple(int(v) for v in value.split(','))
+            else:
+                options[name] = int(value)
+        except (KeyError, ValueError):
+            raise ValueError(f"잘못된 소켓 옵션 값: {assignment}")
+    return options
+
+
+def apply_socket_profile(sock: socket.socket, options: Dict[str, Any]) -> Dict[str, Any]:
+    """옵션 적용, 실제 적용된 값 반환 (버퍼 크기는 커널이 조정한 값)"""
+    applied = {}
+
+    if "nodelay" in options:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(options["nodelay"]))
+        applied["nodelay"] = options["nodelay"]
+
+    for name, option in (("sndbuf", socket.SO_SNDBUF), ("rcvbuf", socket.SO_RCVBUF)):
+        if name in options:
+            sock.setsockopt(socket.SOL_SOCKET, option, options[name])
+            applied[name] = sock.getsockopt(socket.SOL_SOCKET, option)
+
+    keepalive = options.get("keepalive")
+    if keepalive:
+        idle, interval, count = keepalive
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in ((_KEEPIDLE_OPTION, idle), (getattr(socket, "TCP_KEEPINTVL", None), interval),
+                              (getattr(socket, "TCP_KEEPCNT", None), count)):
+            if option is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+        applied["keepalive"] = keepalive
+
+    notsent_lowat = getattr(socket, "TCP_NOTSENT_LOWAT", None)
+    if "notsent_lowat" in options and notsent_lowat is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, notsent_lowat, options["notsent_lowat"])
+        applied["notsent_lowat"] = options["notsent_lowat"]
+
+    if options.get("cork") and _CORK_OPTION is not None:
+        applied["cork"] = True
+    return applied
+
+
+def set_cork(sock: socket.socket, corked: bool):
+    """코르크 켜기/끄기 (끌 때 모아 둔 데이터가 바로 나감, 지원하지 않는 OS면 무시)"""
+    if _CORK_OPTION is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, _CORK_OPTION, int(corked))
+
+
+def _legacy_send(sock, payload: bytes):
+    """예전 send_message 방식: 길이 / 플래그 / 데이터를 send 3번으로"""
+    sock.send(struct.pack('>I', 1 + len(payload)))
+    sock.send(b'\x00')
+    sock.send(payload)
+
+
+def _serve_once(options, produce):
+    """리스너 1개 + 연결 1개, 수락한 소켓에 프로파일 적용 후 produce(sock) 실행 -> 포트"""
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+
+    def run():
+        sock, _ = listener.accept()
+        listener.close()
+        apply_socket_profile(sock, options)
+        try:
+            produce(sock)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return port
+
+
+def _read_frames(sock, count, on_frame, read_rate=None):
+    """프레임 count개 수신 (read_rate 바이트/초로 읽는 속도 제한 가능)"""
+    reader = sock.makefile('rb', buffering=0)
+
+    def read_exact(length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = reader.read(min(length - len(data), 4096 if read_rate else length - len(data)))
+            if not chunk:
+                raise ConnectionError("연결 종료")
+            data += chunk
+            if read_rate:
+                time.sleep(len(chunk) / read_rate)
+        return bytes(data)
+
+    for _ in range(count):
+        length = struct.unpack('>I', read_exact(4))[0]
+        on_frame(read_exact(length)[1:])
+
+
+def bench_latency(options, messages=300, interval=0.005, size=200):
+    """푸시 프레임(이벤트 크기) 전송 지연: 보낸 시각(perf_counter)을 페이로드에 담아 수신 측에서 계산"""
+    from client_channel import ClientChannel, LatencyStats
+
+    def produce(sock):
+        channel = ClientChannel(sock, cork=bool(options.get("cork")))
+        for _ in range(messages):
+            payload = struct.pack('>d', time.perf_counter()) + b'x' * size
+            channel.send_event(struct.pack('>I', 1 + len(payload)) + b'\x00' + payload)
+            time.sleep(interval)
+        channel.wait_drained(5.0)
+
+    stats = LatencyStats()
+    port = _serve_once(options, produce)
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        _read_frames(sock, messages,
+                     lambda payload: stats.record(time.perf_counter() - struct.unpack_from('>d', payload)[0]))
+    return stats.summary()
+
+
+def bench_round_trip(options, legacy, rounds=200, size=200):
+    """
+    요청/응답 왕복 (인증 핸드셰이크, 제어 명령 응답 패턴)
+    작은 send 여러 번 + Nagle + 상대 delayed ACK 조합이면 응답 마지막 조각이 ACK를 기다림
+    """
+    from client_channel import LatencyStats
+
+    reply = b'x' * size
+
+    def produce(sock):
+        reader = sock.makefile('rb')
+        for _ in range(rounds):
+            length = struct.unpack('>I', reader.read(4))[0]
+            reader.read(length)
+            if legacy:
+                _legacy_send(sock, reply)
+            else:
+                sock.sendall(struct.pack('>I', 1 + len(reply)) + b'\x00' + reply)
+
+    stats = LatencyStats()
+    port = _serve_once(options, produce)
+    request = struct.pack('>I', 32) + b'r' * 32
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        reader = sock.makefile('rb')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            sock.sendall(request)
+            reader.read(struct.unpack('>I', reader.read(4))[0])
+            stats.record(time.perf_counter() - start)
+    return stats.summary()
+
+
+def bench_throughput(options, duration=2.0, size=1536):
+    """대량 전송: 프레임 생성이 송신보다 빠를 때 초당 바이트/프레임 (telemetry 레인, 폐기 없음)"""
+    from client_channel import ClientChannel
+
+    frame = struct.pack('>I', 1 + size) + b'\x00' + b'x' * size
+    received = [0]
+
+    def produce(sock):
+        channel = ClientChannel(sock, cork=bool(options.get("cork")), telemetry_backlog=256)
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline and channel.alive:
+            # 레인이 가득 차지 않을 만큼만 (폐기 없이 송신 스레드가 계속 바쁘게)
+            if len(channel._telemetry) < 128:
+                for _ in range(64):
+                    channel.send_telemetry(frame)
+            else:
+                time.sleep(0.0005)
+        channel.close()
+
+    port = _serve_once(options, produce)
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        reader = sock.makefile('rb')
+        while True:
+            chunk = reader.read1(65536)
+            if not chunk:
+                break
+            received[0] += len(chunk)
+    elapsed = time.perf_counter() - start
+    return {"mib_s": received[0] / elapsed / 1024 / 1024, "frames_s": received[0] / len(frame) / elapsed}
+
+
+def bench_slow_reader(options, frames=150, interval=0.01, size=4096, read_rate=200 * 1024):
+    """느린 클라이언트: 읽기 속도보다 빨리 생성될 때 수신한 프레임의 나이 (최신 프레임 우선 여부)"""
+    from client_channel import ClientChannel, LatencyStats
+
+    def produce(sock):
+        channel = ClientChannel(sock, cork=bool(options.get("cork")), telemetry_backlog=1)
+        while channel.alive:
+            payload = struct.pack('>d', time.perf_counter()) + b'x' * size
+            channel.send_telemetry(struct.pack('>I', 1 + len(payload)) + b'\x00' + payload)
+            time.sleep(interval)
+
+    stats = LatencyStats()
+    port = _serve_once(options, produce)
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        # 클라이언트 수신 버퍼를 작게 고정 (폰 쪽 버퍼가 지연을 가리지 않도록)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+        _read_frames(sock, frames,
+                     lambda payload: stats.record(time.perf_counter() - struct.unpack_from('>d', payload)[0]),
+                     read_rate=read_rate)
+    return stats.summary()
+
+
+def benchmark(profiles=None):
+    """루프백에서 프로파일별 지연/처리량"""
+    profiles = profiles or list(SOCKET_PROFILES)
+    print("\n🔁 요청/응답 왕복 (응답 200B, 200회)")
+    for name in profiles:
+        options = resolve_profile(name)
+        for legacy in (True, False):
+            stats = bench_round_trip(options, legacy)
+            label = "send 3번" if legacy else "sendall 1번"
+            print(f"  {name:10s} {label:12s} p50 {stats['p50_ms']:7.3f}ms | p95 {stats['p95_ms']:7.3f}ms | "
+                  f"최대 {stats['max_ms']:7.3f}ms")
+
+    print("\n⏱️  푸시 프레임 지연 (200B 이벤트, 5ms 간격, 300개)")
+    for name in profiles:
+        stats = bench_latency(resolve_profile(name))
+        print(f"  {name:10s} p50 {stats['p50_ms']:7.3f}ms | p95 {stats['p95_ms']:7.3f}ms | "
+              f"최대 {stats['max_ms']:7.3f}ms")
+
+    print("\n📦 대량 전송 (1.5KiB 프레임, 2초)")
+    for name in profiles:
+        result = bench_throughput(resolve_profile(name))
+        print(f"  {name:10s} {result['mib_s']:8.1f}MiB/s | {result['frames_s']:9.0f}프레임/s")
+
+    print("\n🐢 느린 클라이언트 (4KiB 100Hz 생성, 200KiB/s 수신) - 받은 프레임의 나이")
+    for name in profiles:
+        stats = bench_slow_reader(resolve_profile(name))
+        print(f"  {name:10s} p50 {stats['p50_ms']:7.1f}ms | p95 {stats['p95_ms']:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 소켓 튜닝 프로파일")
+    parser.add_argument("command", choices=("bench", "show"))
+    parser.add_argument("--profiles", nargs="+", choices=list(SOCKET_PROFILES), default=None)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        for name, options in SOCKET_PROFILES.items():
+            print(f"{name:10s} {json.dumps(options)}")
+        return
+    benchmark(args.profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+CarrotView 텔레메트리 컬럼 변환/분석 도구
+스트림 녹화 파일을 NumPy 컬럼 배열(.npz)로 변환하고 벡터 연산으로 집계
+
+입력 형식
+- jsonl  : live_demo_server 스트림 (줄바꿈 구분 JSON)
+- framed : test_server 스트림 ([4바이트 길이][압축 플래그][데이터] 반복)
+
+사용법
+  python telemetry_columnar.py convert 녹화.jsonl 세션.npz
+  python telemetry_columnar.py summary 세션.npz
+  python telemetry_columnar.py bench --ticks 5000000
+"""
+
+import argparse
+import gzip
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+from serializers import DEFAULT_FORMAT, get_serializer
+
+
+# 범주형 문자열 컬럼 -> 섹션 (코드 + 이름 테이블로 저장)
+CATEGORICAL_COLUMNS = {
+    "gearShifter": "carState",
+    "alertText": "controlsState",
+    "alertStatus": "controlsState",
+    "thermalStatus": "deviceState",
+}
+
+# 세션 간 끊김 판정 (이보다 긴 간격은 주행 시간에 포함하지 않음)
+DEFAULT_MAX_GAP_S = 1.0
+
+# 자차 차선 판정 폭 (|yRel| 이하)
+EGO_LANE_HALF_WIDTH = 1.8
+
+
+def iter_jsonl_frames(path: str, data_format=DEFAULT_FORMAT) -> Iterator[Dict[str, Any]]:
+    """줄바꿈 구분 녹화 파일에서 텔레메트리 프레임 읽기 (hello 등 제어 메시지 제외)"""
+    serializer = get_serializer(data_format)
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            frame = serializer.decode(line)
+            if isinstance(frame, dict) and 'carState' in frame:
+                yield frame
+
+
+def iter_framed_frames(path: str, data_format=DEFAULT_FORMAT) -> Iterator[Dict[str, Any]]:
+    """길이 프리픽스 녹화 파일에서 텔레메트리 프레임 읽기 (gzip 프레임 해제, 인증/이벤트/백필 배치 제외)"""
+    serializer = get_serializer(data_format)
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            length = struct.unpack('>I', header)[0]
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            body = gzip.decompress(payload[1:]) if payload[:1] == b'\x01' else payload[1:]
+            frame = serializer.decode(body)
+            if isinstance(frame, dict) and frame.get('type') is None and 'carState' in frame:
+                yield frame
+
+
+class ColumnBuilder:
+    """프레임을 한 건씩 받아 컬럼 버퍼(array)에 누적"""
+
+    def __init__(self):
+        self.timestamp = array('q')
+        self.v_ego = array('d')
+        self.v_cruise = array('d')
+        self.steering_angle_deg = array('d')
+        self.door_open = array('b')
+        self.seatbelt_latched = array('b')
+        self.enabled = array('b')
+        self.active = array('b')
+        self.battery_percent = array('h')
+        self.codes = {name: array('h') for name in CATEGORICAL_COLUMNS}
+        self.categories = {name: {} for name in CATEGORICAL_COLUMNS}
+
+        self.track_offsets = array('q', [0])
+        self.track_id = array('i')
+        self.track_d_rel = array('f')
+        self.track_y_rel = array('f')
+        self.track_v_rel = array('f')
+
+    def _code(self, column: str, value: str) -> int:
+        categories = self.categories[column]
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
+
+    def add(self, frame: Dict[str, Any]):
+        """프레임 1건 추가"""
+        car_state = frame.get('carState', {})
+        controls_state = frame.get('controlsState', {})
+        device_state = frame.get('deviceState', {})
+        tracks = frame.get('liveTracks', [])
+
+        self.timestamp.append(int(frame.get('timestamp', 0)))
+        self.v_ego.append(car_state.get('vEgo', 0.0))
+        self.v_cruise.append(car_state.get('vCruise', 0.0))
+        self.steering_angle_deg.append(car_state.get('steeringAngleDeg', 0.0))
+        self.door_open.append(bool(car_state.get('doorOpen', False)))
+        self.seatbelt_latched.append(bool(car_state.get('seatbeltLatched', False)))
+        self.enabled.append(bool(controls_state.get('enabled', False)))
+        self.active.append(bool(controls_state.get('active', False)))
+        self.battery_percent.append(int(device_state.get('batteryPercent', 0)))
+
+        codes = self.codes
+        codes['gearShifter'].append(self._code('gearShifter', car_state.get('gearShifter', '')))
+        codes['alertText'].append(self._code('alertText', controls_state.get('alertText', '')))
+        codes['alertStatus'].append(self._code('alertStatus', controls_state.get('alertStatus', '')))
+        codes['thermalStatus'].append(self._code('thermalStatus', device_state.get('thermalStatus', '')))
+
+        for track in tracks:
+            self.track_id.append(track.get('trackId', 0))
+            self.track_d_rel.append(track.get('dRel', 0.0))
+            self.track_y_rel.append(track.get('yRel', 0.0))
+            self.track_v_rel.append(track.get('vRel', 0.0))
+        self.track_offsets.append(len(self.track_id))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """npz 저장용 배열 dict"""
+        arrays = {
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.int64),
+            "carState.vEgo": np.frombuffer(self.v_ego, dtype=np.float64),
+            "carState.vCruise": np.frombuffer(self.v_cruise, dtype=np.float64),
+            "carState.steeringAngleDeg": np.frombuffer(self.steering_angle_deg, dtype=np.float64),
+            "carState.doorOpen": np.frombuffer(self.door_open, dtype=np.int8).astype(bool),
+            "carState.seatbeltLatched": np.frombuffer(self.seatbelt_latched, dtype=np.int8).astype(bool),
+            "controlsState.enabled": np.frombuffer(self.enabled, dtype=np.int8).astype(bool),
+            "controlsState.active": np.frombuffer(self.active, dtype=np.int8).astype(bool),
+            "deviceState.batteryPercent": np.frombuffer(self.battery_percent, dtype=np.int16),
+            "liveTracks.offsets": np.frombuffer(self.track_offsets, dtype=np.int64),
+            "liveTracks.trackId": np.frombuffer(self.track_id, dtype=np.int32),
+            "liveTracks.dRel": np.frombuffer(self.track_d_rel, dtype=np.float32),
+            "liveTracks.yRel": np.frombuffer(self.track_y_rel, dtype=np.float32),
+            "liveTracks.vRel": np.frombuffer(self.track_v_rel, dtype=np.float32),
+        }
+        for name, section in CATEGORICAL_COLUMNS.items():
+            arrays[f"{section}.{name}"] = np.frombuffer(self.codes[name], dtype=np.int16)
+            arrays[f"{section}.{name}.categories"] = np.array(list(self.categories[name]), dtype=str)
+        return arrays
+
+
+def convert(source: str, output: str, framing="jsonl", data_format=DEFAULT_FORMAT) -> int:
+    """녹화 파일을 .npz 컬럼 파일로 변환, 변환한 틱 수 반환"""
+    reader = iter_framed_frames if framing == "framed" else iter_jsonl_frames
+    builder = ColumnBuilder()
+    for frame in reader(source, data_format):
+        builder.add(frame)
+    np.savez_compressed(output, **builder.to_arrays())
+    return len(builder.timestamp)
+
+
+class TelemetryColumns:
+    """컬럼 텔레메트리 조회 헬퍼 (모든 집계는 벡터 연산)"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.timestamp = arrays["timestamp"]
+        self.v_ego = arrays["carState.vEgo"]
+        self.enabled = arrays["controlsState.enabled"]
+        self.active = arrays["controlsState.active"]
+        self.track_offsets = arrays["liveTracks.offsets"]
+        self.track_d_rel = arrays["liveTracks.dRel"]
+        self.track_y_rel = arrays["liveTracks.yRel"]
+
+    @classmethod
+    def load(cls, path: str) -> 'TelemetryColumns':
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def tick_durations(self, max_gap_s=DEFAULT_MAX_GAP_S) -> np.ndarray:
+        """각 틱이 차지하는 시간(초), 끊김 구간은 0으로 처리"""
+        if len(self.timestamp) < 2:
+            return np.zeros(len(self.timestamp))
+        dt = np.diff(self.timestamp, append=self.timestamp[-1]) / 1000.0
+        dt[(dt < 0) | (dt > max_gap_s)] = 0.0
+        return dt
+
+    def engagement_time(self, max_gap_s=DEFAULT_MAX_GAP_S) -> Dict[str, float]:
+        """총 주행/자율주행 활성/크루즈 동작 시간 (초)"""
+        dt = self.tick_durations(max_gap_s)
+        return {
+            "total_s": float(dt.sum()),
+            "enabled_s": float(dt[self.enabled].sum()),
+            "active_s": float(dt[self.active].sum()),
+        }
+
+    def speed_profile(self, window_s=1.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        시간 창별 평균/최대 속도 (km/h)
+        반환: (창 시작 timestamp(ms), 평균 속도, 최대 속도)
+        """
+        if len(self.timestamp) == 0:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty, empty
+        window_ms = int(window_s * 1000)
+        window = (self.timestamp - self.timestamp[0]) // window_ms
+        starts = np.flatnonzero(np.r_[True, window[1:] != window[:-1]])
+        speed_kmh = self.v_ego * 3.6
+        counts = np.diff(np.r_[starts, len(speed_kmh)])
+        mean = np.add.reduceat(speed_kmh, starts) / counts
+        peak = np.maximum.reduceat(speed_kmh, starts)
+        return self.timestamp[starts], mean, peak
+
+    def speed_histogram(self, bin_kmh=10.0, max_gap_s=DEFAULT_MAX_GAP_S) -> Tuple[np.ndarray, np.ndarray]:
+        """속도 구간별 체류 시간 (초), 반환: (구간 경계 km/h, 시간)"""
+        speed_kmh = self.v_ego * 3.6
+        top = max(bin_kmh, float(speed_kmh.max(initial=0.0)) + bin_kmh)
+        edges = np.arange(0.0, top + bin_kmh, bin_kmh)
+        seconds, _ = np.histogram(speed_kmh, bins=edges, weights=self.tick_durations(max_gap_s))
+        return edges, seconds
+
+    def closest_track_distance(self, ego_lane_only=False,
+                               lane_half_width=EGO_LANE_HALF_WIDTH) -> np.ndarray:
+        """틱별 가장 가까운 트랙 거리 dRel (트랙이 없으면 NaN)"""
+        d_rel = self.track_d_rel.astype(np.float64)
+        if ego_lane_only:
+            d_rel = np.where(np.abs(self.track_y_rel) <= lane_half_width, d_rel, np.inf)
+        # 끝에 inf 하나를 덧붙여 마지막 틱들이 비어 있어도 reduceat 인덱스가 유효하도록 함
+        d_rel = np.append(d_rel, np.inf)
+
+        starts = self.track_offsets[:-1]
+        closest = np.minimum.reduceat(d_rel, starts)
+        # reduceat은 빈 구간에서 시작 원소를 돌려주므로 트랙 없는 틱은 NaN 처리
+        closest[self.track_offsets[1:] == starts] = np.nan
+        closest[np.isinf(closest)] = np.nan
+        return closest
+
+    def summary(self) -> Dict[str, Any]:
+        """세션 요약"""
+        engagement = self.engagement_time()
+        closest = self.closest_track_distance()
+        has_closest = ~np.isnan(closest)
+        speed_kmh = self.v_ego * 3.6
+        return {
+            "ticks": len(self),
+            "duration_s": engagement["total_s"],
+            "enabled_s": engagement["enabled_s"],
+            "active_s": engagement["active_s"],
+            "mean_speed_kmh": float(speed_kmh.mean()) if len(self) else 0.0,
+            "max_speed_kmh": float(speed_kmh.max(initial=0.0)),
+            "tracks": int(self.track_offsets[-1]),
+            "min_closest_m": float(closest[has_closest].min()) if has_closest.any() else None,
+            "mean_closest_m": float(closest[has_closest].mean()) if has_closest.any() else None,
+        }
+
+
+def synthetic_columns(ticks: int, seed=0) -> TelemetryColumns:
+    """벤치마크용 합성 세션 (10Hz, 틱당 트랙 0~8개)"""
+    rng = np.random.default_rng(seed)
+    timestamp = 1_700_000_000_000 + np.arange(ticks, dtype=np.int64) * 100
+    v_ego = np.clip(np.cumsum(rng.normal(0.0, 0.3, ticks)), 0.0, 40.0)
+    enabled = (np.arange(ticks) // 3000) % 2 == 1
+    track_counts = rng.integers(0, 9, ticks)
+    offsets = np.r_[0, np.cumsum(track_counts)].astype(np.int64)
+    total_tracks = int(offsets[-1])
+    return TelemetryColumns({
+        "timestamp": timestamp,
+        "carState.vEgo": v_ego,
+        "controlsState.enabled": enabled,
+        "controlsState.active": enabled & (v_ego > 5),
+        "liveTracks.offsets": offsets,
+        "liveTracks.dRel": rng.uniform(10.0, 100.0, total_tracks).astype(np.float32),
+        "liveTracks.yRel": rng.uniform(-3.5, 3.5, total_tracks).astype(np.float32),
+    })
+
+
+def benchmark(ticks: int):
+    """대용량 합성 세션으로 집계 속도 측정"""
+    print(f"합성 세션 생성: {ticks:,}틱 ({ticks / 36000:.1f}시간 @10Hz)")
+    columns = synthetic_columns(ticks)
+    print(f"  트랙 {int(columns.track_offsets[-1]):,}개")
+
+    for label, query in (
+        ("engagement_time", columns.engagement_time),
+        ("speed_profile(1s)", columns.speed_profile),
+        ("speed_histogram", columns.speed_histogram),
+        ("closest_track_distance", columns.closest_track_distance),
+        ("closest_track_distance(ego)", lambda: columns.closest_track_distance(ego_lane_only=True)),
+    ):
+        start = time.perf_counter()
+        query()
+        print(f"  {label:30s} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+def print_summary(path: str):
+    """npz 세션 요약 출력"""
+    summary = TelemetryColumns.load(path).summary()
+    print(f"📊 {path}")
+    print(f"  틱: {summary['ticks']:,} | 주행 시간: {summary['duration_s']:.1f}s")
+    print(f"  🤖 자율주행: {summary['enabled_s']:.1f}s (활성 {summary['active_s']:.1f}s)")
+    print(f"  🚗 평균 속도: {summary['mean_speed_kmh']:.1f} km/h | 최고: {summary['max_speed_kmh']:.1f} km/h")
+    if summary['min_closest_m'] is not None:
+        print(f"  🚨 가장 가까운 차량: 최소 {summary['min_closest_m']:.1f}m | 평균 {summary['mean_closest_m']:.1f}m")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView 텔레메트리 컬럼 변환/분석")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="녹화 파일 → .npz")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("output")
+    convert_parser.add_argument("--framing", choices=("jsonl", "framed"), default="jsonl")
+    convert_parser.add_argument("--format", dest="data_format", default=DEFAULT_FORMAT)
+
+    summary_parser = commands.add_parser("summary", help=".npz 세션 요약")
+    summary_parser.add_argument("path")
+
+    bench_parser = commands.add_parser("bench", help="집계 벤치마크")
+    bench_parser.add_argument("--ticks", type=int, default=5_000_000)
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        start = time.perf_counter()
+        ticks = convert(args.source, args.output, args.framing, args.data_format)
+        print(f"✅ {ticks:,}틱 변환 완료 ({time.perf_counter() - start:.1f}s): {args.output}")
+    elif args.command == "summary":
+        print_summary(args.path)
+    elif args.command == "bench":
+        benchmark(args.ticks)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+CarrotView 텔레메트리 상태 모델
+섹션 단위 변경 추적 + 섹션별 인코딩 조각 캐시
+
+매 틱 전체 dict를 다시 만들어 json.dumps 하는 대신, 상태를 섹션별 튜플로 보관하고
+값이 실제로 바뀐 섹션만 버전을 올림. FrameEncoder는 버전이 같은 섹션의 인코딩
+바이트를 그대로 재사용하고 프레임을 조각 이어 붙이기로 완성함
+"""
+
+import json
+import timeit
+from typing import Any, Dict, List
+
+from serializers import get_serializer, available_formats
+
+
+# 섹션 인덱스 (versions 순서)
+CAR_STATE = 0
+CONTROLS_STATE = 1
+LIVE_TRACKS = 2
+DEVICE_STATE = 3
+
+CAR_STATE_FIELDS = ("vEgo", "vCruise", "gearShifter", "doorOpen", "seatbeltLatched", "steeringAngleDeg")
+CONTROLS_STATE_FIELDS = ("enabled", "active", "alertText", "alertStatus")
+DEVICE_STATE_FIELDS = ("batteryPercent", "thermalStatus")
+
+
+class TelemetryState:
+    """
+    텔레메트리 상태 (섹션별 튜플 + 변경 버전)
+    set_* 호출 시 이전 값과 같으면 버전을 올리지 않음
+    """
+
+    __slots__ = ('timestamp', 'seq', 'car_state', 'controls_state', 'live_tracks', 'device_state', 'versions')
+
+    def __init__(self):
+        self.timestamp = 0
+        self.seq = 0  # 프레임 순번 (히스토리 백필과 실시간 프레임 이어 붙이기 기준)
+        self.car_state = (0.0, 0.0, "park", False, True, 0.0)
+        self.controls_state = (False, False, "", "normal")
+        self.live_tracks = []
+        self.device_state = (100, "green")
+        self.versions = [0, 0, 0, 0]
+
+    def set_car_state(self, v_ego, v_cruise, gear_shifter, door_open, seatbelt_latched, steering_angle_deg):
+        """carState 갱신"""
+        values = (v_ego, v_cruise, gear_shifter, door_open, seatbelt_latched, steering_angle_deg)
+        if values != self.car_state:
+            self.car_state = values
+            self.versions[CAR_STATE] += 1
+
+    def set_controls_state(self, enabled, active, alert_text, alert_status):
+        """controlsState 갱신"""
+        values = (enabled, active, alert_text, alert_status)
+        if values != self.controls_state:
+            self.controls_state = values
+            self.versions[CONTROLS_STATE] += 1
+
+    def set_live_tracks(self, tracks: List[Dict[str, Any]]):
+        """liveTracks 갱신 (전달한 리스트는 이후 수정하지 말 것)"""
+        if tracks != self.live_tracks:
+            self.live_tracks = tracks
+            self.versions[LIVE_TRACKS] += 1
+
+    def set_device_state(self, battery_percent, thermal_status):
+        """deviceState 갱신"""
+        values = (battery_percent, thermal_status)
+        if values != self.device_state:
+            self.device_state = values
+            self.versions[DEVICE_STATE] += 1
+
+    def section(self, index: int) -> Any:
+        """섹션을 프로토콜 형태(dict/list)로 반환"""
+        if index == CAR_STATE:
+            return dict(zip(CAR_STATE_FIELDS, self.car_state))
+        if index == CONTROLS_STATE:
+            return dict(zip(CONTROLS_STATE_FIELDS, self.controls_state))
+        if index == LIVE_TRACKS:
+            return self.live_tracks
+        return dict(zip(DEVICE_STATE_FIELDS, self.device_state))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """전체 프레임 dict (기존 get_current_data 형식)"""
+        return {
+            "timestamp": self.timestamp,
+            "seq": self.seq,
+            "carState": self.section(CAR_STATE),
+            "controlsState": self.section(CONTROLS_STATE),
+            "liveTracks": self.section(LIVE_TRACKS),
+            "deviceState": self.section(DEVICE_STATE)
+        }
+
+
+class FrameEncoder:
+    """
+    섹션 조각 캐시 기반 프레임 인코더 (직렬화 포맷별 1개)
+    조각 이어 붙이기를 지원하지 않는 포맷은 to_dict() 전체 인코딩으로 처리
+    """
+
+    __slots__ = ('serializer', '_versions', '_fragments', 'encoded_sections', 'reused_sections')
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self._versions = [-1, -1, -1, -1]
+        self._fragments = [b'', b'', b'', b'']
+        self.encoded_sections = 0
+        self.reused_sections = 0
+
+    def encode(self, state: TelemetryState) -> bytes:
+        """현재 상태를 프레임 바이트로 인코딩"""
+        serializer = self.serializer
+        if not serializer.supports_fragments:
+            return serializer.encode(state.to_dict())
+
+        versions = state.versions
+        fragments = self._fragments
+        for index in (CAR_STATE, CONTROLS_STATE, LIVE_TRACKS, DEVICE_STATE):
+            if self._versions[index] != versions[index]:
+                fragments[index] = serializer.encode_fragment(state.section(index))
+                self._versions[index] = versions[index]
+                self.encoded_sections += 1
+            else:
+                self.reused_sections += 1
+
+        return serializer.splice_frame(b'%d' % state.timestamp, b'%d' % state.seq, *fragments)
+
+
+def benchmark(ticks=3000):
+    """dict 재생성 + json.dumps 대비 섹션 캐시 인코딩 비용 비교"""
+    from live_demo_server import LiveCarrotPilotSimulator
+
+    # 동일한 시나리오 궤적을 미리 만들어 두 방식에 똑같이 적용
+    simulator = LiveCarrotPilotSimulator()
+    states = []
+    for _ in range(ticks):
+        simulator.advance()
+        state = simulator.state
+        states.append((state.timestamp, state.car_state, state.controls_state,
+                       state.live_tracks, state.device_state))
+
+    def replay(encode):
+        state = TelemetryState()
+        for timestamp, car, controls, tracks, device in states:
+            state.timestamp = timestamp
+            state.set_car_state(*car)
+            state.set_controls_state(*controls)
+            state.set_live_tracks(tracks)
+            state.set_device_state(*device)
+            encode(state)
+
+    def baseline(state):
+        json.dumps(state.to_dict(), ensure_ascii=False).encode('utf-8')
+
+    print(f"시나리오 {ticks}틱 (liveTracks는 매 틱 무작위로 변경)")
+    base = min(timeit.repeat(lambda: replay(baseline), number=1, repeat=5)) / ticks * 1e6
+    print(f"  {'dict 재생성 + json.dumps':34s} {base:7.2f} µs/tick")
+
+    for fmt in available_formats():
+        encoder = FrameEncoder(get_serializer(fmt, ensure_ascii=False))
+        best = min(timeit.repeat(lambda: replay(encoder.encode), number=1, repeat=5)) / ticks * 1e6
+        reused = encoder.reused_sections / max(1, encoder.reused_sections + encoder.encoded_sections)
+        print(f"  {'FrameEncoder (' + fmt + ')':34s} {best:7.2f} µs/tick  x{base / best:4.1f}  "
+              f"섹션 재사용 {reused * 100:4.1f}%")
+
+    # 바이트 동일성 확인
+    encoder = FrameEncoder(get_serializer("json", ensure_ascii=False))
+    state = TelemetryState()
+    for seq, (timestamp, car, controls, tracks, device) in enumerate(states[:500]):
+        state.timestamp = timestamp
+        state.seq = seq
+        state.set_car_state(*car)
+        state.set_controls_state(*controls)
+        state.set_live_tracks(tracks)
+        state.set_device_state(*device)
+        if encoder.encode(state) != json.dumps(state.to_dict(), ensure_ascii=False).encode('utf-8'):
+            print("❌ json.dumps 출력과 다름")
+            return
+    print("✅ json.dumps 출력과 바이트 단위로 동일")
+
+
+def main():
+    print("🧪 CarrotView 섹션 캐시 인코딩 벤치마크")
+    print("=" * 50)
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,60 @@
 #!/usr/bin/env python3
 """
 CarrotView 클라이언트 테스트 - 서버 연결 및 데이터 수신 테스트
+
+- newline : live_demo_server 스트림 (줄바꿈 구분, 인증 없음)
+- framed  : test_server 스트림 (길이 프리픽스 + 인증), --udp로 텔레메트리를 UDP로 수신
 """
 
 import socket
 import json
 import time
+import struct
+import gzip
+import argparse
 import threading
+from collections import deque
+
+from serializers import DEFAULT_FORMAT, get_serializer
+from client_channel import LatencyStats
+from udp_transport import UdpTelemetryReceiver
+
+AUTH_TOKEN = "carrotview2024"
 
 
 class CarrotViewTestClient:
     """CarrotView 테스트 클라이언트"""
     
-    def __init__(self, host='localhost', port=8080):
+    def __init__(self, host='localhost', port=8080, protocol="newline", data_format=None,
+                 udp=False, udp_relay=None, quiet=False, compression=None, max_hz=None, token=AUTH_TOKEN,
+                 backfill=None, max_tracks=None, max_track_bytes=None):
         self.host = host
         self.port = port
+        self.protocol = protocol
+        self.data_format = data_format
+        self.udp = udp
+        self.udp_relay = udp_relay  # (수신 주소) -> 중계기, 손실 주입 시험용
+        self.quiet = quiet
+        self.compression = compression  # "gzip" 요청 시 서버가 큰 프레임을 압축 (플래그 0x01)
+        self.max_hz = max_hz  # 서버에 요청하는 최대 수신 빈도
+        self.token = token
+        self.backfill = backfill  # 인증 직후 받을 히스토리 (초, True면 서버가 보관 중인 전체)
+        self.backfill_frames = 0
+        self.max_tracks = max_tracks  # liveTracks 예산 (먼 트랙부터 양자화/제외, track_lod)
+        self.max_track_bytes = max_track_bytes
+        self.last_seq = None  # 텔레메트리 seq 연속성 (백필 -> 실시간 전환 확인)
+        self.seq_gaps = 0
+        self._seq_lock = threading.Lock()  # UDP 수신 스레드와 TCP 수신 스레드가 함께 갱신
+        self.seq_duplicates = 0
+        self.received_bytes = 0
         self.socket = None
         self.running = False
         self.data_count = 0
+        self.serializer = get_serializer(DEFAULT_FORMAT)
+        self.events = deque(maxlen=1000)  # 최근 (이벤트, 수신 지연 ms)
+        self.telemetry_latency = LatencyStats()  # 프레임 timestamp -> 수신
+        self.udp_receiver = None
+        self.relay = None
         
     def connect(self):
         """서버에 연결"""
@@ -26,6 +63,14 @@ class CarrotViewTestClient:
             self.socket.connect((self.host, self.port))
             self.running = True
             
+            if self.protocol == "framed" and not self.authenticate():
+                print("❌ 인증 실패")
+                self.disconnect()
+                return False
+            if self.protocol == "newline":
+                # 이벤트 줄 구독 (live_demo_server는 구독한 클라이언트에게만 이벤트 전송)
+                self.socket.sendall(json.dumps({"type": "subscribe", "events": True}).encode('utf-8') + b'\n')
+            
             print(f"✅ 서버 연결 성공: {self.host}:{self.port}")
             return True
             
@@ -33,21 +78,89 @@ class CarrotViewTestClient:
             print(f"❌ 서버 연결 실패: {e}")
             return False
     
+    def authenticate(self):
+        """test_server 인증 (challenge -> token), UDP 사용 시 수신 포트 등록"""
+        request = json.loads(self.receive_frame()[1:])
+        if request.get('type') != 'auth_required':
+            return False
+        
+        response = {
+            "token": f"{self.token}_{request['challenge']}",
+            "timestamp": int(time.time()),
+            "events": True
+        }
+        if self.data_format:
+            response["format"] = self.data_format
+        if self.compression:
+            response["compression"] = self.compression
+        if self.max_hz:
+            response["max_hz"] = self.max_hz
+        if self.backfill:
+            response["backfill"] = self.backfill
+        if self.max_tracks is not None:
+            response["max_tracks"] = self.max_tracks
+        if self.max_track_bytes is not None:
+            response["max_track_bytes"] = self.max_track_bytes
+        
+        if self.udp:
+            self.udp_receiver = UdpTelemetryReceiver(self.process_message)
+            udp_port = self.udp_receiver.port
+            if self.udp_relay is not None:
+                self.relay = self.udp_relay(('127.0.0.1', udp_port))
+                self.relay.start()
+                udp_port = self.relay.port
+            response["udp_port"] = udp_port
+        
+        payload = json.dumps(response).encode('utf-8')
+        self.socket.sendall(struct.pack('>I', len(payload)) + payload)
+        
+        result = json.loads(self.receive_frame()[1:])
+        if result.get('type') != 'auth_success':
+            return False
+        
+        self.serializer = get_serializer(result.get('format'))
+        if self.udp_receiver is not None:
+            if not result.get('udp'):
+                print("⚠️  서버가 UDP 전송을 지원하지 않아 TCP로 수신합니다")
+            self.udp_receiver.start()
+        return True
+    
+    def receive_exact(self, length):
+        """정확히 length 바이트 수신 (연결 종료 시 None)"""
+        data = b''
+        while len(data) < length:
+            chunk = self.socket.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+    
+    def receive_frame(self):
+        """길이 프리픽스 프레임 1개 수신 (압축 플래그 포함)"""
+        header = self.receive_exact(4)
+        if header is None:
+            return None
+        return self.receive_exact(struct.unpack('>I', header)[0])
+    
     def receive_data(self):
         """데이터 수신 및 처리"""
-        buffer = ""
+        if self.protocol == "framed":
+            self.receive_framed_data()
+            return
+        
+        buffer = b""
         
         while self.running:
             try:
-                data = self.socket.recv(4096).decode('utf-8')
+                data = self.socket.recv(4096)
                 if not data:
                     break
                 
                 buffer += data
                 
-                # 줄바꿈으로 구분된 JSON 메시지 처리
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
+                # 줄바꿈으로 구분된 메시지 처리
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
                     if line.strip():
                         self.process_message(line.strip())
                         
@@ -56,19 +169,84 @@ class CarrotViewTestClient:
                     print(f"데이터 수신 오류: {e}")
                 break
     
+    def receive_framed_data(self):
+        """길이 프리픽스 프레임 수신 (압축 플래그 1바이트 제외 후 처리)"""
+        while self.running:
+            try:
+                frame = self.receive_frame()
+                if frame is None:
+                    break
+                self.received_bytes += 4 + len(frame)
+                # 압축 플래그 0x01 = gzip
+                self.process_message(gzip.decompress(frame[1:]) if frame[0] == 0x01 else frame[1:])
+            except Exception as e:
+                if self.running:
+                    print(f"데이터 수신 오류: {e}")
+                break
+    
     def process_message(self, message):
         """수신된 메시지 처리"""
         try:
-            data = json.loads(message)
+            data = self.serializer.decode(message)
+            
+            # 핸드셰이크: 서버가 안내한 데이터 포맷으로 전환
+            if isinstance(data, dict) and data.get('type') == 'hello':
+                self.serializer = get_serializer(data.get('format'))
+                print(f"🤝 데이터 포맷: {self.serializer.name}")
+                return
+            
+            # 우선순위 이벤트 (경고/상태 전환)
+            if isinstance(data, dict) and data.get('type') == 'event':
+                self.process_event(data)
+                return
+            
+            # 히스토리 백필 배치 (이후 실시간 프레임은 last_seq + 1부터)
+            if isinstance(data, dict) and data.get('type') == 'backfill':
+                self.backfill_frames += data['count']
+                for frame in data['frames']:
+                    self.track_seq(frame.get('seq'))
+                self.last_seq = data['last_seq']
+                if not self.quiet:
+                    print(f"🕘 백필 {data['count']}프레임 (seq {data['first_seq']}~{data['last_seq']})")
+                return
+            
+            self.track_seq(data.get('seq'))
             self.data_count += 1
+            self.telemetry_latency.record(max(0.0, time.time() - data.get('timestamp', 0) / 1000))
             
             # 5초마다 상태 출력
-            if self.data_count % 50 == 0:
+            if self.data_count % 50 == 0 and not self.quiet:
                 self.print_data_summary(data)
                 
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
             print(f"JSON 파싱 오류: {e}")
     
+    def track_seq(self, seq):
+        """텔레메트리 seq 누락/중복 집계 (max_hz 컨플레이션 구간은 누락으로 보임)"""
+        if seq is None:
+            return
+        with self._seq_lock:
+            if self.last_seq is not None:
+                if seq <= self.last_seq:
+                    self.seq_duplicates += 1
+                    return
+                self.seq_gaps += seq - self.last_seq - 1
+            self.last_seq = seq
+    
+    def process_event(self, event):
+        """경고/상태 전환 이벤트 처리 (서버 타임스탬프 기준 수신 지연 기록)"""
+        latency_ms = time.time() * 1000 - event.get('timestamp', 0)
+        self.events.append((event, latency_ms))
+        
+        if self.quiet:
+            return
+        if event.get('event') == 'alert':
+            print(f"⚠️  [이벤트] 경고 변경: {event.get('alertText', '')} ({event.get('alertStatus', '')}) "
+                  f"- {latency_ms:.1f}ms")
+        else:
+            print(f"🔔 [이벤트] 상태 전환: enabled={event.get('enabled')} active={event.get('active')} "
+                  f"- {latency_ms:.1f}ms")
+    
     def print_data_summary(self, data):
         """데이터 요약 출력"""
         car_state = data.get('carState', {})
@@ -108,15 +286,40 @@ class CarrotViewTestClient:
         self.running = False
         if self.socket:
             self.socket.close()
+        if self.udp_receiver:
+            self.udp_receiver.stop()
+        if self.relay:
+            self.relay.stop()
         print("🔌 연결 해제됨")
 
 
 def main():
     """메인 함수"""
+    parser = argparse.ArgumentParser(description="CarrotView 클라이언트 테스트")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--protocol", choices=("newline", "framed"), default="newline",
+                        help="newline: live_demo_server, framed: test_server")
+    parser.add_argument("--format", dest="data_format", default=None)
+    parser.add_argument("--udp", action="store_true", help="텔레메트리를 UDP로 수신 (framed 전용)")
+    parser.add_argument("--gzip", action="store_true", help="gzip 압축 요청 (framed 전용)")
+    parser.add_argument("--max-hz", type=float, default=None, help="최대 수신 빈도 요청 (framed 전용)")
+    parser.add_argument("--token", default=AUTH_TOKEN, help="인증 토큰 (framed 전용)")
+    parser.add_argument("--backfill", type=float, default=None, metavar="SECONDS",
+                        help="인증 직후 최근 SECONDS초 히스토리 수신 (framed 전용)")
+    parser.add_argument("--max-tracks", type=int, default=None,
+                        help="liveTracks 최대 트랙 수 (먼 트랙부터 제외, framed 전용)")
+    parser.add_argument("--max-track-bytes", type=int, default=None,
+                        help="liveTracks 바이트 예산 (먼 트랙부터 양자화/제외, framed 전용)")
+    args = parser.parse_args()
+    
     print("📱 CarrotView 클라이언트 테스트")
     print("=" * 40)
     
-    client = CarrotViewTestClient()
+    client = CarrotViewTestClient(args.host, args.port, args.protocol, args.data_format, args.udp,
+                                  compression="gzip" if args.gzip else None, max_hz=args.max_hz,
+                                  token=args.token, backfill=args.backfill, max_tracks=args.max_tracks,
+                                  max_track_bytes=args.max_track_bytes)
     
     if client.connect():
         print("📡 데이터 수신 시작... (Ctrl+C로 중지)")
@@ -136,6 +339,13 @@ def main():
             
         finally:
             client.disconnect()
+            if client.udp_receiver:
+                stats = client.udp_receiver.stats()
+                print(f"📶 UDP: 수신 {stats['delivered']} | 손실 {stats['lost']} | "
+                      f"역순 {stats['reordered']} | 중복 {stats['duplicates']}")
+            if client.backfill:
+                print(f"🕘 백필 {client.backfill_frames}프레임 | seq 누락 {client.seq_gaps} | "
+                      f"중복 {client.seq_duplicates}")
     else:
         print("❌ 서버에 연결할 수 없습니다.")
         print("💡 먼저 live_demo_server.py를 실행하세요.")
@@ -10,22 +10,98 @@ import socket
 import threading
 import random
 import struct
+import gzip
+import argparse
+
+from serializers import available_formats, get_serializer, negotiate_format
+from telemetry_state import FrameEncoder, TelemetryState
+from client_channel import DEFAULT_TELEMETRY_BACKLOG, ClientChannel, StateEventDetector
+from discovery import DISCOVERY_PORT, DiscoveryResponder
+from udp_transport import UdpTelemetrySender
+from control_api import CONTROL_PORT, ControlServer, ScriptRunner, load_script
+from sim_clock import SystemClock, VirtualClock
+from profiling import RuntimeProfiler
+from history import DEFAULT_HISTORY_BYTES, DEFAULT_HISTORY_SECONDS, FrameHistory
+from socket_tuning import (DEFAULT_SOCKET_PROFILE, SOCKET_PROFILES, apply_socket_profile,
+                           parse_socket_options, resolve_profile)
+from track_lod import TrackLodView, parse_track_budget, select_tracks
+
+
+# 기본 인증 토큰 (클라이언트는 "<토큰>_<challenge>"로 응답)
+AUTH_TOKEN = "carrotview2024"
+
+# 이보다 작은 프레임은 압축 요청 클라이언트에게도 압축하지 않음 (압축 플래그는 프레임마다 있음)
+COMPRESSION_MIN_BYTES = 256
+
+# 인증 응답 대기 시간 (응답 없는 연결이 다른 클라이언트 수락을 막지 않도록 연결마다 별도 스레드)
+AUTH_TIMEOUT = 5.0
+
+# 제어 명령 필드 -> 서버 속성
+CONTROL_ATTRIBUTES = {
+    "speed": "speed",
+    "enabled": "autopilot_enabled",
+    "active": "autopilot_active",
+    "gear": "gear",
+    "alert_text": "alert_text",
+    "alert_status": "alert_status",
+}
 
 
 class TestTCPServer:
     """테스트용 TCP 서버"""
     
-    def __init__(self, port=8080):
+    telemetry_backlog = DEFAULT_TELEMETRY_BACKLOG  # 클라이언트별 텔레메트리 대기 프레임 수
+    
+    def __init__(self, port=8080, formats=None, discovery_port=DISCOVERY_PORT, tick_interval=0.1,
+                 control_port=None, clock=None, auth_token=AUTH_TOKEN,
+                 history_seconds=DEFAULT_HISTORY_SECONDS, history_bytes=DEFAULT_HISTORY_BYTES,
+                 socket_profile=DEFAULT_SOCKET_PROFILE):
         self.port = port
+        self.auth_token = auth_token
+        self.clock = clock or SystemClock()  # 타임스탬프/틱 간격/스크립트 시각 기준
+        self.tick_interval = tick_interval  # 기본 0.1초 (10Hz)
         self.running = False
         self.clients = []
         self.server_socket = None
+        self.discovery_port = discovery_port  # None이면 UDP 탐색 응답 안 함
+        self.discovery = None
+        self.control_port = control_port  # None이면 제어 API 없음
+        self.control = None
+        self.socket_options = resolve_profile(socket_profile)  # 수락한 클라이언트 소켓에 적용
+        self.profiler = RuntimeProfiler(type(self).__name__)  # 시그널/제어 API로 켜고 끔
+        
+        # 직렬화 포맷 (인증 핸드셰이크에서 협상, 인증 메시지 자체는 항상 JSON)
+        self.formats = formats or available_formats()
+        self.frame_encoders = {name: FrameEncoder(get_serializer(name)) for name in self.formats}
+        
+        # 텔레메트리 상태 (carState/liveTracks/deviceState는 실제 데이터 대기용 기본값)
+        self.state = TelemetryState()
+        
+        # liveTracks 예산별 LOD 상태 사본 (예산을 요청한 클라이언트가 있는 동안만 유지)
+        self.lod_views = {}
+        
+        # 최근 프레임 히스토리 (재연결한 클라이언트 백필용, 첫 번째 포맷으로 보관, 0초면 사용 안 함)
+        self.history = FrameHistory(get_serializer(self.formats[0]), history_seconds, history_bytes) \
+            if history_seconds else None
+        
+        # 경고/상태 전환 이벤트 (우선순위 레인으로 즉시 전송)
+        self.event_detector = StateEventDetector()
+        self.event_detector.detect(self.state.controls_state, 0)
+        self.state_lock = threading.Lock()  # 상태 변경은 틱 사이에서만 적용
+        
+        # UDP 텔레메트리 (인증 시 udp_port를 보낸 클라이언트에게만)
+        self.udp_sender = UdpTelemetrySender()
         
         # 시뮬레이션 데이터
         self.speed = 0.0  # m/s (시작은 정지 상태)
         self.cruise_speed = 25.0  # m/s (약 90 km/h)
         self.autopilot_enabled = False  # 시작은 비활성
         self.autopilot_active = False  # 크루즈 비활성
+        self.gear = "park"
+        self.alert_text = ""
+        self.alert_status = "normal"
+        self.live_tracks = []  # 제어 API의 tracks(주변 차량 수)로 생성
+        self.car_state_controlled = False  # 제어 명령으로 speed/gear를 바꾸기 전까지 carState는 기본값 그대로
         self.simulation_time = 0  # 시뮬레이션 시간
         
     def start(self):
@@ -34,19 +110,36 @@ class TestTCPServer:
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(('0.0.0.0', self.port))
         self.server_socket.listen(5)
+        self.port = self.server_socket.getsockname()[1]  # port=0이면 임의 포트
         self.running = True
         
         print(f"✅ TCP 서버 시작: 포트 {self.port}")
         print(f"📱 앱에서 연결하세요: {self.get_local_ip()}:{self.port}")
         
         # 클라이언트 수락 스레드
-        accept_thread = threading.Thread(target=self.accept_clients, daemon=True)
+        accept_thread = threading.Thread(target=self.accept_clients, name="accept", daemon=True)
         accept_thread.start()
         
         # 데이터 전송 스레드
-        broadcast_thread = threading.Thread(target=self.broadcast_data, daemon=True)
+        broadcast_thread = threading.Thread(target=self.broadcast_data, name="broadcast", daemon=True)
         broadcast_thread.start()
         
+        # UDP 탐색 응답기
+        if self.discovery_port:
+            self.discovery = DiscoveryResponder(self.port, {
+                "formats": self.formats,
+                "events": True,
+                "framing": "length-prefixed",
+                "auth": "challenge",
+                "udp": True
+            }, name="CarrotView 테스트 서버", discovery_port=self.discovery_port)
+            self.discovery.start()
+        
+        # 제어 API (input() 메뉴 없이 상태 변경/스크립트 실행)
+        if self.control_port is not None:
+            self.control = ControlServer(self, port=self.control_port)
+            self.control.start()
+        
     def get_local_ip(self):
         """로컬 IP 주소 가져오기"""
         try:
@@ -62,17 +155,16 @@ class TestTCPServer:
         """클라이언트 연결 수락"""
         while self.running:
             try:
+                if self.profiler.deterministic:
+                    self.profiler.checkpoint()
                 self.server_socket.settimeout(1.0)
                 client_socket, address = self.server_socket.accept()
+                apply_socket_profile(client_socket, self.socket_options)
                 print(f"🔗 클라이언트 연결: {address}")
                 
-                # 인증 처리
-                if self.authenticate_client(client_socket):
-                    self.clients.append(client_socket)
-                    print(f"✅ 인증 성공: {address}")
-                else:
-                    print(f"❌ 인증 실패: {address}")
-                    client_socket.close()
+                # 인증 처리 (스레드 이름 "accept-" 접두사로 프로파일 대상에 포함)
+                threading.Thread(target=self.handshake, args=(client_socket, address),
+                                 name=f"accept-{address[1]}", daemon=True).start()
                     
             except socket.timeout:
                 continue
@@ -80,14 +172,50 @@ class TestTCPServer:
                 if self.running:
                     print(f"❌ 연결 오류: {e}")
     
+    def handshake(self, client_socket, address):
+        """연결 1개의 인증/등록 스레드 (cprofile 중이면 이 스레드도 프로파일)"""
+        if self.profiler.deterministic:
+            self.profiler.checkpoint()
+        try:
+            self.register_client(client_socket, address)
+        finally:
+            self.profiler.release()
+    
+    def register_client(self, client_socket, address):
+        """인증 후 송신 채널 등록 (AUTH_TIMEOUT 안에 응답이 없으면 연결 종료)"""
+        client_socket.settimeout(AUTH_TIMEOUT)
+        session = self.authenticate_client(client_socket)
+        if session and self.running:
+            udp_port = session.pop('udp_port')
+            udp_address = (address[0], udp_port) if udp_port else None
+            backfill = session.pop('backfill')
+            # 백필 스냅샷과 채널 등록만 틱 사이에 한 번에 (다음 실시간 프레임이 정확히 last_seq + 1)
+            # 배치 생성/압축은 채널 송신 스레드가 잠금 밖에서 (그동안 실시간 프레임은 레인에 쌓임)
+            with self.state_lock:
+                preamble = None
+                if backfill is not False:
+                    frames, last_seq = self.history.snapshot(backfill), self.history.last_seq
+                    preamble = lambda: self.backfill_message(frames, last_seq, session['data_format'],
+                                                             session['track_budget'])
+                self.clients.append(ClientChannel(client_socket, address, udp_address=udp_address,
+                                                  clock=self.clock, profiler=self.profiler, preamble=preamble,
+                                                  cork=self.socket_options.get("cork", False),
+                                                  telemetry_backlog=self.telemetry_backlog, **session))
+            transport = f"UDP {udp_port}" if udp_port else "TCP"
+            print(f"✅ 인증 성공: {address} ({session['data_format']}, {transport})")
+        else:
+            print(f"❌ 인증 실패: {address}")
+            client_socket.close()
+    
     def authenticate_client(self, client_socket):
-        """클라이언트 인증"""
+        """클라이언트 인증 (성공 시 협상된 세션 옵션 반환, 실패 시 None)"""
         try:
             # 인증 요청 전송
             auth_request = {
                 "type": "auth_required",
                 "timestamp": int(time.time()),
-                "challenge": f"carrotview_{int(time.time())}"
+                "challenge": f"carrotview_{int(time.time())}",
+                "formats": self.formats
             }
             self.send_message(client_socket, json.dumps(auth_request))
             
@@ -95,39 +223,66 @@ class TestTCPServer:
             response = self.receive_message(client_socket)
             if response:
                 response_data = json.loads(response)
-                expected_token = f"carrotview2024_{auth_request['challenge']}"
+                expected_token = f"{self.auth_token}_{auth_request['challenge']}"
                 
                 if response_data.get('token') == expected_token:
+                    # 클라이언트가 요청한 포맷 중 지원하는 것 선택 (없으면 json)
+                    data_format = negotiate_format(response_data.get('format'), self.formats)
+                    # 이벤트 프레임은 요청한 클라이언트에게만 전송 (앱 파서는 텔레메트리만 처리)
+                    events = bool(response_data.get('events', False))
+                    # 텔레메트리 UDP 수신 포트 (TCP 세션은 인증/제어/이벤트용으로 유지)
+                    udp_port = response_data.get('udp_port')
+                    udp_port = udp_port if isinstance(udp_port, int) and 0 < udp_port < 65536 else None
+                    # 압축(gzip, 압축 플래그 0x01)과 최대 수신 빈도(느린 대시보드용 최신 프레임만 전송)
+                    # UDP 데이터그램에는 압축 플래그가 없으므로 UDP 클라이언트는 압축 안 함 (응답에 None으로 알림)
+                    compression = "gzip" if response_data.get('compression') == "gzip" and udp_port is None else None
+                    max_hz = response_data.get('max_hz')
+                    max_hz = float(max_hz) if isinstance(max_hz, (int, float)) and max_hz > 0 else None
+                    # 히스토리 백필 (초, true면 보관 중인 전체) - 히스토리가 없으면 무시
+                    backfill = response_data.get('backfill', False)
+                    if self.history is None or backfill is False or backfill is None:
+                        backfill = False
+                    elif backfill is True:
+                        backfill = None
+                    elif isinstance(backfill, (int, float)) and backfill > 0:
+                        backfill = float(backfill)
+                    else:
+                        backfill = False
+                    
+                    # liveTracks 예산 (먼 트랙 양자화/제외, 같은 예산끼리 선택 결과 공유)
+                    track_budget = parse_track_budget(response_data)
+                    
                     # 인증 성공 응답
                     success_response = {
                         "type": "auth_success",
                         "server_version": "1.0",
-                        "compression_supported": True
+                        "compression_supported": True,
+                        "format": data_format,
+                        "events": events,
+                        "udp": udp_port is not None,
+                        "compression": compression,
+                        "max_hz": max_hz,
+                        "backfill": backfill is not False,
+                        "history_seconds": self.history.seconds if self.history else 0,
+                        "max_tracks": track_budget.max_tracks if track_budget else None,
+                        "max_track_bytes": track_budget.max_bytes if track_budget else None
                     }
                     self.send_message(client_socket, json.dumps(success_response))
-                    return True
+                    return {"data_format": data_format, "events": events, "udp_port": udp_port,
+                            "compression": compression, "max_hz": max_hz, "backfill": backfill,
+                            "track_budget": track_budget}
             
-            return False
+            return None
             
         except Exception as e:
             print(f"인증 오류: {e}")
-            return False
+            return None
     
     def send_message(self, client_socket, message):
         """메시지 전송 (TCPClient 프로토콜: 길이 + 압축플래그 + 데이터)"""
         try:
-            message_bytes = message.encode('utf-8')
-            compression_flag = 0x00  # 압축 안 함
-            
-            # 전체 길이 = 압축플래그(1바이트) + 메시지
-            total_length = 1 + len(message_bytes)
-            
-            # 길이 전송 (4바이트)
-            client_socket.send(struct.pack('>I', total_length))
-            # 압축 플래그 전송 (1바이트)
-            client_socket.send(bytes([compression_flag]))
-            # 메시지 전송
-            client_socket.send(message_bytes)
+            # 한 번에 전송 (조각으로 나눠 보내면 Nagle + 상대 delayed ACK로 응답마다 약 40ms 지연)
+            client_socket.sendall(self.frame_message(message.encode('utf-8')))
             
         except Exception as e:
             print(f"전송 오류: {e}")
@@ -156,111 +311,331 @@ class TestTCPServer:
             print(f"수신 오류: {e}")
             return None
     
+    def backfill_message(self, frames, last_seq, data_format, track_budget=None):
+        """
+        히스토리 스냅샷 -> 백필 배치 프레임 (항상 gzip, 채널 송신 스레드에서 호출하므로 직렬화기는 따로 생성)
+        liveTracks 예산이 있으면 실시간 프레임과 같은 선택을 저장된 프레임마다 적용
+        """
+        if track_budget is not None:
+            serializer = self.history.serializer
+            limited = []
+            for seq, timestamp, stored in frames:
+                frame = serializer.decode(stored)
+                frame["liveTracks"] = select_tracks(frame.get("liveTracks") or [], track_budget)
+                limited.append((seq, timestamp, serializer.encode(frame)))
+            frames = limited
+        payload = self.history.build_backfill(frames, last_seq, get_serializer(data_format))
+        return self.frame_message(payload, "gzip")
+    
+    def frame_message(self, payload, compression=None):
+        """전송 프레임 (길이 4바이트 + 압축 플래그 + 데이터), gzip 요청 시 큰 프레임만 압축"""
+        if compression == "gzip" and len(payload) >= COMPRESSION_MIN_BYTES:
+            payload = gzip.compress(payload, compresslevel=1, mtime=0)
+            return struct.pack('>I', 1 + len(payload)) + b'\x01' + payload
+        return struct.pack('>I', 1 + len(payload)) + b'\x00' + payload
+    
+    def update_state(self):
+        """상태 모델 갱신 - 상태만 전송 (실제 데이터는 CarrotPilot에서)"""
+        # 랜덤 데이터 없이 상태만 전송 (값이 바뀐 섹션만 다시 인코딩됨)
+        self.state.timestamp = self.clock.time_ms()
+        if self.car_state_controlled:
+            self.state.set_car_state(self.speed, self.cruise_speed if self.autopilot_active else 0.0,
+                                     self.gear, False, True, 0.0)
+        self.state.set_controls_state(self.autopilot_enabled, self.autopilot_active,
+                                      self.alert_text, self.alert_status)
+        self.state.set_live_tracks(self.live_tracks)
+    
     def generate_data(self):
-        """테스트 데이터 생성 - 상태만 전송 (실제 데이터는 CarrotPilot에서)"""
-        # 랜덤 데이터 없이 상태만 전송
-        
+        """테스트 데이터 생성"""
+        self.update_state()
+        return self.state.to_dict()
+    
+    def set_autopilot_state(self, enabled, active, speed):
+        """차량 상태 변경 후 상태 전환 이벤트 즉시 전송 (다음 틱을 기다리지 않음, carState는 그대로)"""
+        with self.state_lock:
+            self.speed = speed
+        self.apply_control({"enabled": enabled, "active": active})
+    
+    def apply_control(self, changes):
+        """
+        제어 명령 적용 (control_api.parse_command로 검증된 변경 사항)
+        상태 잠금 안에서 한 번에 반영하므로 틱 사이에만 적용되고, 이벤트는 즉시 전송
+        """
+        with self.state_lock:
+            for key, value in changes.items():
+                if key in CONTROL_ATTRIBUTES:
+                    setattr(self, CONTROL_ATTRIBUTES[key], value)
+            if "speed" in changes or "gear" in changes:
+                self.car_state_controlled = True
+            if "tracks" in changes:
+                self.live_tracks = self.make_tracks(changes["tracks"])
+            if "tick_hz" in changes:
+                self.tick_interval = 1.0 / changes["tick_hz"]
+            self.update_state()
+            self.publish_events()
+            return self.control_snapshot()
+    
+    def control_snapshot(self):
+        """현재 제어 상태"""
         return {
-            "timestamp": int(time.time() * 1000),
-            "carState": {
-                "vEgo": 0.0,  # 실제 CarrotPilot 데이터 대기
-                "vCruise": 0.0,
-                "gearShifter": "park",
-                "doorOpen": False,
-                "seatbeltLatched": True,
-                "steeringAngleDeg": 0.0
-            },
-            "controlsState": {
-                "enabled": self.autopilot_enabled,
-                "active": self.autopilot_active,
-                "alertText": "",
-                "alertStatus": "normal"
-            },
-            "liveTracks": [],  # 빈 배열 - 실제 데이터 없음
-            "deviceState": {
-                "batteryPercent": 100,
-                "thermalStatus": "green"
-            }
+            "speed": self.speed,
+            "enabled": self.autopilot_enabled,
+            "active": self.autopilot_active,
+            "gear": self.gear,
+            "alert_text": self.alert_text,
+            "alert_status": self.alert_status,
+            "tracks": len(self.live_tracks),
+            "tick_hz": 1.0 / self.tick_interval,
+            "clients": len(self.clients),
         }
     
+    def make_tracks(self, count):
+        """주변 차량 count대 (거리/차선 고정 배치라 매 틱 다시 인코딩되지 않음)"""
+        return [{
+            "trackId": i + 1,
+            "dRel": round(10.0 + i * 90.0 / max(count, 1), 1),
+            "yRel": (0.0, -3.5, 3.5)[i % 3],
+            "vRel": 0.0
+        } for i in range(count)]
+    
+    def publish_events(self):
+        """경고/상태 전환 감지 후 이벤트 프레임을 우선순위 레인으로 전송"""
+        events = self.event_detector.detect(self.state.controls_state, self.state.timestamp)
+        if events:
+            self.send_events(events)
+    
+    def send_events(self, events, created=None):
+        """이벤트를 구독 클라이언트의 우선순위 레인으로 전송 (포맷별로 한 번만 인코딩)"""
+        created = created if created is not None else time.perf_counter()
+        for event in events:
+            messages = {}
+            for channel in list(self.clients):
+                if not channel.events:
+                    continue
+                message = messages.get(channel.data_format)
+                if message is None:
+                    serializer = self.frame_encoders[channel.data_format].serializer
+                    message = messages[channel.data_format] = self.frame_message(serializer.encode(event))
+                channel.send_event(message, created)
+    
+    def fan_out(self, encode):
+        """
+        텔레메트리 프레임 1개를 모든 클라이언트에 전송, 끊긴 채널 목록 반환
+        encode(data_format, track_budget) -> 직렬화된 프레임 (포맷/예산 조합별 한 번, 압축은 그 조합 + 압축별 한 번)
+        """
+        messages = {}
+        payloads = {}
+        udp_targets = {}  # (포맷, 예산) -> UDP 주소 목록
+        disconnected = []
+        
+        for channel in list(self.clients):
+            if not channel.alive:
+                disconnected.append(channel)
+                continue
+            variant = (channel.data_format, channel.track_budget)
+            payload = payloads.get(variant)
+            if payload is None:
+                payload = payloads[variant] = encode(*variant)
+            if channel.udp_address:
+                if channel.admit_telemetry():
+                    udp_targets.setdefault(variant, []).append(channel.udp_address)
+                continue
+            key = (variant, channel.compression)
+            message = messages.get(key)
+            if message is None:
+                message = messages[key] = self.frame_message(payload, channel.compression)
+            channel.send_telemetry(message)
+        
+        # UDP 데이터그램 (시퀀스 번호 + 송신 시각 헤더), 시퀀스는 틱당 1개를 모든 변형이 공유
+        if udp_targets:
+            seq = self.udp_sender.next_seq()
+            for variant, addresses in udp_targets.items():
+                self.udp_sender.send(payloads[variant], addresses, seq)
+        return disconnected
+    
+    def remove_clients(self, channels):
+        """연결 끊긴 클라이언트 제거"""
+        if not channels:
+            return
+        for channel in channels:
+            if channel in self.clients:
+                self.clients.remove(channel)
+            channel.close()
+            print(f"🔌 클라이언트 연결 해제: {channel.address}")
+        # 더 이상 쓰는 클라이언트가 없는 예산의 LOD 상태 정리 (handshake의 채널 등록과 겹치지 않도록 상태 잠금 안에서)
+        with self.state_lock:
+            budgets = {channel.track_budget for channel in self.clients}
+            for budget in [budget for budget in self.lod_views if budget not in budgets]:
+                del self.lod_views[budget]
+    
+    def encode_frame(self, data_format, track_budget=None):
+        """현재 상태의 텔레메트리 프레임 (예산이 있으면 liveTracks LOD 적용, 예산별 선택은 틱당 한 번)"""
+        if track_budget is None:
+            return self.frame_encoders[data_format].encode(self.state)
+        view = self.lod_views.get(track_budget)
+        if view is None:
+            view = self.lod_views[track_budget] = TrackLodView(
+                track_budget, {name: encoder.serializer for name, encoder in self.frame_encoders.items()})
+        return view.encode(data_format, self.state)
+    
     def broadcast_data(self):
         """데이터 브로드캐스트"""
         while self.running:
             try:
-                if self.clients:
-                    data = self.generate_data()
-                    json_str = json.dumps(data)
+                if self.profiler.deterministic:
+                    self.profiler.checkpoint()
+                # 히스토리가 있으면 클라이언트가 없어도 계속 기록 (가상 시간은 제외)
+                if self.clients or (self.history is not None and not self.clock.virtual):
+                    encode = self.encode_frame
+                    stages = self.profiler.stages  # 프로파일링 중일 때만 단계별 시간 기록
                     
-                    # 압축 플래그 없이 전송
-                    message = b'\x00' + json_str.encode('utf-8')
+                    # 상태 갱신 + 이벤트 + 모든 클라이언트 송신 큐에 추가 (틱 단위로 원자적)
+                    with self.state_lock:
+                        if stages:
+                            started = time.perf_counter()
+                        self.update_state()
+                        self.state.seq += 1
+                        self.publish_events()
+                        if stages:
+                            generated = time.perf_counter()
+                            stages.record("generate", generated - started)
+                            encode = stages.wrap("serialize", encode)
+                        disconnected = self.fan_out(encode)
+                        if stages:
+                            stages.record("fan_out", time.perf_counter() - generated)
+                        if self.history is not None:
+                            self.history.append(self.state.seq, self.state.timestamp,
+                                                encode(self.history.serializer.name))
                     
-                    # 모든 클라이언트에게 전송
-                    disconnected = []
-                    for client in self.clients:
-                        try:
-                            # 길이 전송
-                            length = len(message)
-                            client.send(struct.pack('>I', length))
-                            # 데이터 전송
-                            client.send(message)
-                        except Exception as e:
-                            print(f"❌ 전송 실패: {e}")
-                            disconnected.append(client)
+                    self.remove_clients(disconnected)
                     
-                    # 연결 끊긴 클라이언트 제거
-                    for client in disconnected:
-                        self.clients.remove(client)
-                        print(f"🔌 클라이언트 연결 해제")
+                    # 가상 시간: 모든 클라이언트가 이번 틱을 받은 뒤에 시간 진행 (프레임 폐기 없음)
+                    if self.clock.virtual:
+                        for channel in list(self.clients):
+                            channel.wait_drained(1.0)
+                elif self.clock.virtual:
+                    # 가상 시간은 클라이언트가 있을 때만 진행
+                    time.sleep(0.01)
+                    continue
                 
-                time.sleep(0.1)  # 10Hz
+                self.clock.sleep(self.tick_interval)
                 
             except Exception as e:
                 print(f"브로드캐스트 오류: {e}")
     
+    def print_event_latency(self):
+        """클라이언트별 이벤트 전송 지연 출력"""
+        if not self.clients:
+            print("연결된 클라이언트 없음")
+        for channel in self.clients:
+            stats = channel.event_latency.summary()
+            print(f"📨 {channel.address}: 이벤트 {stats['count']}건 | "
+                  f"p50 {stats['p50_ms']:.2f}ms | p95 {stats['p95_ms']:.2f}ms | 최대 {stats['max_ms']:.2f}ms | "
+                  f"폐기 프레임 {channel.dropped_frames}")
+    
     def stop(self):
         """서버 중지"""
+        self.profiler.stop()  # 프로파일링 중이었으면 결과 저장
         self.running = False
         for client in self.clients:
             client.close()
         if self.server_socket:
             self.server_socket.close()
+        if self.discovery:
+            self.discovery.stop()
+        if self.control:
+            self.control.stop()
+        self.udp_sender.close()
         print("🛑 서버 중지")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="CarrotView 테스트 서버")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--formats", nargs="+", default=None,
+                        help=f"제공할 직렬화 포맷 (기본: {' '.join(available_formats())})")
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT,
+                        help="UDP 탐색 응답 포트 (0이면 사용 안 함)")
+    parser.add_argument("--control-port", type=int, default=CONTROL_PORT,
+                        help="HTTP 제어 API 포트 (0이면 사용 안 함)")
+    parser.add_argument("--script", default=None, help="시작 시 실행할 제어 스크립트 (JSON/JSONL)")
+    parser.add_argument("--headless", action="store_true",
+                        help="명령 입력 없이 실행 (스크립트가 있으면 끝날 때 종료)")
+    parser.add_argument("--virtual", action="store_true",
+                        help="가상 시간 (틱을 기다리지 않고 클라이언트가 받는 속도로 진행)")
+    parser.add_argument("--history", type=float, default=DEFAULT_HISTORY_SECONDS, metavar="SECONDS",
+                        help="백필용 히스토리 보관 시간 (0이면 사용 안 함)")
+    parser.add_argument("--history-kib", type=int, default=DEFAULT_HISTORY_BYTES // 1024,
+                        help="히스토리 메모리 상한 (KiB, 페이로드 합)")
+    parser.add_argument("--socket-profile", choices=list(SOCKET_PROFILES), default=DEFAULT_SOCKET_PROFILE,
+                        help="클라이언트 소켓 튜닝 프로파일")
+    parser.add_argument("--socket-option", action="append", default=[], metavar="KEY=VALUE",
+                        help="프로파일 옵션 덮어쓰기 (예: sndbuf=262144, keepalive=10,3,3)")
+    args = parser.parse_args()
+    try:
+        socket_options = resolve_profile(args.socket_profile, parse_socket_options(args.socket_option))
+    except ValueError as e:
+        parser.error(str(e))
+    
+    script = load_script(args.script) if args.script else None
+    
     print("🚗 CarrotView 테스트 서버")
     print("=" * 50)
     
-    server = TestTCPServer(port=8080)
+    server = TestTCPServer(port=args.port, formats=args.formats, discovery_port=args.discovery_port,
+                           control_port=args.control_port or None,
+                           clock=VirtualClock() if args.virtual else None,
+                           history_seconds=args.history, history_bytes=args.history_kib * 1024,
+                           socket_profile=socket_options)
     server.start()
+    server.profiler.install_signals()  # kill -USR1 <pid>: sampling, -USR2: cprofile
+    
+    runner = ScriptRunner(script, server.apply_control, server.clock).start() if script else None
+    if runner:
+        print(f"📜 제어 스크립트 실행: {args.script} ({len(script['steps'])}단계)")
+    
+    if args.headless:
+        try:
+            while runner is None or runner.error is None and (runner.running or runner.loop):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        print("\n\n종료 중...")
+        server.stop()
+        return
     
     print("\n서버 실행 중...")
     print("\n📋 명령어:")
     print("  1 - 차량 연결 (enabled=True, active=False)")
     print("  2 - 크루즈 활성화 (enabled=True, active=True, speed=20)")
     print("  0 - 대기 상태 (enabled=False, active=False)")
+    print("  l - 이벤트 전송 지연 통계")
+    print("  p - 프로파일링 켜기/끄기 (sampling)")
     print("  q - 종료")
     print()
     
     try:
         while True:
-            cmd = input("명령 입력: ").strip()
+            try:
+                cmd = input("명령 입력: ").strip()
+            except EOFError:
+                # 표준 입력이 없으면 (백그라운드/CI) 제어 API로만 조작
+                while True:
+                    time.sleep(1)
             
             if cmd == '0':
-                server.autopilot_enabled = False
-                server.autopilot_active = False
-                server.speed = 0.0
+                server.set_autopilot_state(False, False, 0.0)
                 print("✅ 대기 상태로 변경")
             elif cmd == '1':
-                server.autopilot_enabled = True
-                server.autopilot_active = False
-                server.speed = 0.0
+                server.set_autopilot_state(True, False, 0.0)
                 print("✅ 차량 연결됨 (크루즈 대기)")
             elif cmd == '2':
-                server.autopilot_enabled = True
-                server.autopilot_active = True
-                server.speed = 20.0
+                server.set_autopilot_state(True, True, 20.0)
                 print("✅ 크루즈 활성화 (주행 중)")
+            elif cmd == 'l':
+                server.print_event_latency()
+            elif cmd == 'p':
+                server.profiler.toggle()
             elif cmd == 'q':
                 break
             else:
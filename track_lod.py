@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+CarrotView liveTracks 거리 기반 LOD (클라이언트별 예산)
+작은 화면/느린 링크의 대시보드는 구독 시 liveTracks 예산을 정하고, 서버는 예산에 맞게
+먼 트랙을 양자화하거나 제외한 프레임을 보냄 (가까운 트랙과 자차 차선 트랙은 항상 원래 정밀도)
+
+- 예산 요청 : 인증 응답에 "max_tracks": 트랙 수, "max_track_bytes": liveTracks 바이트 (JSON 기준 추정)
+- 우선 트랙 : 자차 차선(|yRel| <= EGO_LANE_HALF_WIDTH) 또는 NEAR_DISTANCE 이내, 원래 값 그대로
+- 먼 트랙   : dRel/vRel은 1m, 1m/s 단위 정수, yRel은 0.5m 단위 (앱 모델 필드는 모두 유지)
+- 예산 초과 : 가장 먼 트랙부터 제외 -> 그래도 넘으면 우선 트랙도 먼 것부터 양자화 -> 제외
+- 선택 비용 : 서로 다른 예산마다 liveTracks가 바뀐 틱에 한 번 (같은 예산 클라이언트 수와 무관)
+- 잘못된 트랙: dRel/yRel이 없거나 숫자가 아닌 트랙은 예산 클라이언트에 보내지 않음 (틱을 중단하지 않음)
+- 백필     : 예산 클라이언트의 백필 배치 프레임에도 같은 선택 적용
+
+사용법
+  python track_lod.py check       # 예산별 프레임 크기, 우선 트랙 정밀도, 선택 횟수 확인
+"""
+
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import random
+import socket
+import struct
+import threading
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+from telemetry_state import LIVE_TRACKS, FrameEncoder, TelemetryState
+
+
+EGO_LANE_HALF_WIDTH = 1.75  # m, 차선 폭 3.5m의 절반
+NEAR_DISTANCE = 30.0        # m, 이 거리 안의 트랙은 차선과 무관하게 우선
+
+# 클라이언트 1개의 liveTracks 예산 (None이면 제한 없음), 같은 값이면 LOD 결과를 공유
+TrackBudget = namedtuple("TrackBudget", ("max_tracks", "max_bytes"))
+
+
+def parse_track_budget(request: Dict[str, Any]) -> Optional[TrackBudget]:
+    """인증 응답의 max_tracks / max_track_bytes -> TrackBudget (둘 다 없거나 잘못된 값이면 None)"""
+    def limit(key):
+        value = request.get(key)
+        return value if isinstance(value, int) and not isinstance(value, bool) and value >= 0 else None
+
+    budget = TrackBudget(limit('max_tracks'), limit('max_track_bytes'))
+    return budget if budget != (None, None) else None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_valid_track(track) -> bool:
+    """LOD 판단에 필요한 dRel/yRel이 숫자인 트랙 (vRel은 없어도 되지만 있으면 숫자)"""
+    return (isinstance(track, dict) and _is_number(track.get("dRel")) and _is_number(track.get("yRel"))
+            and _is_number(track.get("vRel", 0)))
+
+
+def is_priority(track: Dict[str, Any]) -> bool:
+    """원래 정밀도를 유지할 트랙 (자차 차선 또는 가까운 트랙, 잘못된 트랙은 False)"""
+    if not is_valid_track(track):
+        return False
+    return abs(track["yRel"]) <= EGO_LANE_HALF_WIDTH or track["dRel"] <= NEAR_DISTANCE
+
+
+def quantize(track: Dict[str, Any]) -> Dict[str, Any]:
+    """먼 트랙 양자화 (정수는 JSON/MessagePack 모두 실수보다 짧게 인코딩됨, is_valid_track인 트랙만)"""
+    return {
+        "trackId": track.get("trackId"),
+        "dRel": round(track["dRel"]),
+        "yRel": round(track["yRel"] * 2) / 2,
+        "vRel": round(track.get("vRel", 0)),
+    }
+
+
+def track_size(track: Dict[str, Any]) -> int:
+    """트랙 1개의 JSON 크기 추정 (구분자 ', ' 포함)"""
+    return len(json.dumps(track)) + 2
+
+
+def select_tracks(tracks: List[Dict[str, Any]], budget: TrackBudget) -> List[Dict[str, Any]]:
+    """예산에 맞춘 liveTracks (dRel 순, 잘못된 트랙은 제외)"""
+    # 상태 잠금 안(fan_out)에서 호출되므로 잘못된 트랙 1개로 모든 클라이언트의 틱이 중단되지 않게 먼저 거름
+    tracks = [track for track in tracks if is_valid_track(track)]
+    # 우선 트랙(가까운 순) -> 나머지(가까운 순), 뒤쪽부터 잘라냄
+    ranked = sorted(tracks, key=lambda track: (not is_priority(track), track["dRel"]))
+    if budget.max_tracks is not None:
+        ranked = ranked[:budget.max_tracks]
+    priority = [is_priority(track) for track in ranked]
+    chosen = [track if keep else quantize(track) for track, keep in zip(ranked, priority)]
+
+    if budget.max_bytes is not None:
+        sizes = [track_size(track) for track in chosen]
+        total = sum(sizes)
+        # 1) 먼 트랙 제외 (가장 먼 것부터)
+        while chosen and total > budget.max_bytes and not priority[-1]:
+            total -= sizes.pop()
+            chosen.pop()
+            priority.pop()
+        # 2) 우선 트랙 양자화 (가장 먼 것부터)
+        for index in reversed(range(len(chosen))):
+            if total <= budget.max_bytes:
+                break
+            chosen[index] = quantize(chosen[index])
+            size = track_size(chosen[index])
+            total += size - sizes[index]
+            sizes[index] = size
+        # 3) 그래도 넘으면 제외
+        while chosen and total > budget.max_bytes:
+            total -= sizes.pop()
+            chosen.pop()
+
+    chosen.sort(key=lambda track: track["dRel"])
+    return chosen
+
+
+class TrackLodView:
+    """
+    예산 1개의 상태 사본 (liveTracks만 LOD 결과로 교체) + 포맷별 FrameEncoder
+    원본 liveTracks 버전이 바뀔 때만 다시 선택하고, 나머지 섹션은 원본 값을 그대로 따라감
+    """
+
+    def __init__(self, budget: TrackBudget, serializers):
+        self.budget = budget
+        self.state = TelemetryState()
+        self.encoders = {name: FrameEncoder(serializer) for name, serializer in serializers.items()}
+        self.selections = 0
+        self._source_version = None
+
+    def update(self, source: TelemetryState) -> TelemetryState:
+        state = self.state
+        state.timestamp = source.timestamp
+        state.seq = source.seq
+        state.set_car_state(*source.car_state)
+        state.set_controls_state(*source.controls_state)
+        state.set_device_state(*source.device_state)
+        if self._source_version != source.versions[LIVE_TRACKS]:
+            state.set_live_tracks(select_tracks(source.live_tracks, self.budget))
+            self._source_version = source.versions[LIVE_TRACKS]
+            self.selections += 1
+        return state
+
+    def encode(self, data_format: str, source: TelemetryState) -> bytes:
+        """원본 상태의 이번 틱 프레임 (예산 적용, 포맷이 여러 개여도 선택은 한 번)"""
+        return self.encoders[data_format].encode(self.update(source))
+
+
+def _connect(port, max_tracks=None, max_track_bytes=None, backfill=False):
+    """예산을 요청하는 프레임 클라이언트 (인증까지) -> (소켓, 페이로드 읽기 함수, auth_success)"""
+    from test_server import AUTH_TOKEN
+
+    sock = socket.create_connection(("127.0.0.1", port), timeout=10.0)
+    reader = sock.makefile('rb')
+
+    def read():
+        frame = reader.read(struct.unpack('>I', reader.read(4))[0])
+        return gzip.decompress(frame[1:]) if frame[:1] == b'\x01' else frame[1:]
+
+    request = json.loads(read())
+    response = {"token": f"{AUTH_TOKEN}_{request['challenge']}", "format": "json", "backfill": backfill}
+    if max_tracks is not None:
+        response["max_tracks"] = max_tracks
+    if max_track_bytes is not None:
+        response["max_track_bytes"] = max_track_bytes
+    payload = json.dumps(response).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(payload)) + payload)
+    return sock, read, json.loads(read())
+
+
+# 매 틱 liveTracks에 섞어 보내는 잘못된 트랙 (예산 클라이언트 프레임에는 없어야 함)
+MALFORMED_TRACKS = [
+    {"trackId": 900, "dRel": 12.0},                             # yRel 없음
+    {"trackId": 901, "dRel": "far", "yRel": 0.0, "vRel": 1.0},  # dRel이 숫자가 아님
+    {"trackId": 902, "dRel": 20.0, "yRel": None, "vRel": 0.0},
+]
+
+
+def check(frames=300, tracks=32, clients_per_budget=3):
+    """
+    예산별 liveTracks 크기/정밀도, 선택 횟수(예산 수 x 틱) 확인 (가상 시간, 매 틱 트랙 이동)
+    잘못된 트랙이 섞여도 틱이 계속되는지, 늦게 붙은 예산 클라이언트의 백필 프레임도 예산 안인지 확인
+    """
+    from sim_clock import VirtualClock
+    from test_server import TestTCPServer
+
+    class MovingTracksServer(TestTCPServer):
+        """매 틱 모든 트랙의 거리/속도가 바뀌는 서버 (LOD 선택이 매 틱 필요)"""
+
+        def update_state(self):
+            self.live_tracks = [dict(track, dRel=round(track["dRel"] + random.uniform(-0.5, 0.5), 2),
+                                     vRel=round(random.uniform(-3.0, 3.0), 2))
+                                for track in self.make_tracks(tracks)] + MALFORMED_TRACKS
+            super().update_state()
+
+    budgets = [(None, None), (8, None), (None, 400), (4, 200)]
+    devnull = open(os.devnull, 'w')
+    with devnull, contextlib.redirect_stdout(devnull):
+        server = MovingTracksServer(port=0, discovery_port=None, clock=VirtualClock(), history_seconds=5)
+        server.start()
+        server.apply_control({"speed": 20.0, "gear": "drive"})
+        sessions = [(budget, _connect(server.port, *budget))
+                    for budget in budgets for _ in range(clients_per_budget)]
+        received = [[] for _ in sessions]
+
+        def receive(index, read):
+            try:
+                for _ in range(frames):
+                    received[index].append(json.loads(read()))
+            except OSError:
+                pass  # 틱이 멈추면 타임아웃 -> 프레임 수 부족으로 실패 처리
+
+        readers = [threading.Thread(target=receive, args=(index, session[1]))
+                   for index, (_, session) in enumerate(sessions)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        ticks = server.state.seq
+        selections = {view.budget: view.selections for view in server.lod_views.values()}
+        # 히스토리가 쌓인 뒤 가장 작은 예산으로 백필 요청
+        late_budget = budgets[-1]
+        late = _connect(server.port, *late_budget, backfill=True)
+        backfill = json.loads(late[1]())
+        late[0].close()
+        for _, (sock, _, _) in sessions:
+            sock.close()
+        server.stop()
+
+    # 예산 없는 클라이언트 프레임 (seq 기준)으로 정밀도 비교
+    full = {frame["seq"]: [track for track in frame["liveTracks"] if is_valid_track(track)]
+            for frame in received[0]}
+    print(f"\n🛰️ 트랙 {tracks}대 (+잘못된 트랙 {len(MALFORMED_TRACKS)}개), "
+          f"예산 {len(budgets)}종 x 클라이언트 {clients_per_budget}개, {frames}프레임")
+    ok = all(len(items) == frames for items in received)
+    malformed_ids = {track["trackId"] for track in MALFORMED_TRACKS}
+    for index in range(0, len(sessions), clients_per_budget):
+        budget, (_, _, auth) = sessions[index]
+        budget_frames = received[index]
+        sizes = [len(json.dumps(frame["liveTracks"])) for frame in budget_frames]
+        counts = [len(frame["liveTracks"]) for frame in budget_frames]
+        for frame in budget_frames:
+            original = {track["trackId"]: track for track in full.get(frame["seq"], [])}
+            priority_ids = {track_id for track_id, track in original.items() if is_priority(track)}
+            kept = {track["trackId"]: track for track in frame["liveTracks"]}
+            within = budget[0] is None or len(kept) <= budget[0]
+            within = within and (budget[1] is None or sum(map(track_size, kept.values())) <= budget[1])
+            within = within and (budget == (None, None) or not malformed_ids & kept.keys())
+            # 예산이 우선 트랙을 모두 담을 수 있으면 우선 트랙은 원래 값 그대로여야 함
+            room = budget[0] is None or budget[0] >= len(priority_ids)
+            room = room and (budget[1] is None or sum(track_size(original[i]) for i in priority_ids) <= budget[1])
+            exact = not room or all(kept.get(i) == original[i] for i in priority_ids)
+            ok = ok and within and exact
+        label = "제한 없음" if budget == (None, None) else \
+            f"트랙 {budget[0] or '-'} / {budget[1] or '-'}B"
+        echoed = (auth.get("max_tracks"), auth.get("max_track_bytes")) == budget
+        ok = ok and echoed
+        print(f"  {label:18s} liveTracks 평균 {sum(sizes) / len(sizes):6.0f}B, {sum(counts) / len(counts):4.1f}대"
+              f"  선택 {selections.get(budget, 0)}회")
+
+    # 서로 다른 예산마다 틱당 최대 1회 (클라이언트 수와 무관)
+    limited = len(budgets) - 1
+    ok = ok and len(selections) == limited and all(count <= ticks for count in selections.values())
+    print(f"  총 선택 {sum(selections.values())}회 / {ticks}틱 (예산 {limited}종, 클라이언트 "
+          f"{limited * clients_per_budget}개)")
+
+    # 백필 배치 프레임도 실시간 프레임과 같은 예산
+    backfill_ok = backfill.get("type") == "backfill" and backfill["count"] > 0 and all(
+        len(frame["liveTracks"]) <= late_budget[0]
+        and sum(map(track_size, frame["liveTracks"])) <= late_budget[1]
+        and not malformed_ids & {track["trackId"] for track in frame["liveTracks"]}
+        for frame in backfill["frames"])
+    ok = ok and backfill_ok
+    print(f"  백필 {backfill.get('count', 0)}프레임 (트랙 {late_budget[0]} / {late_budget[1]}B): "
+          + ("예산 준수" if backfill_ok else "예산 초과"))
+    print("✅ 예산 준수, 우선 트랙 원래 정밀도 유지" if ok else "❌ 예산 초과 또는 우선 트랙 정밀도 손실")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView liveTracks LOD")
+    parser.add_argument("command", choices=("check",))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--tracks", type=int, default=32)
+    args = parser.parse_args()
+
+    raise SystemExit(0 if check(args.frames, args.tracks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+CarrotView UDP 텔레메트리 전송
+TCP 세션은 인증/제어/이벤트용으로 유지하고, 텔레메트리 프레임만 UDP 데이터그램으로 전송
+
+데이터그램: [헤더 16바이트][직렬화된 프레임]
+  헤더 = 매직 b'CV' + 버전(1) + 예약(1) + 시퀀스(uint32) + 송신 시각(uint64, µs)
+
+수신 측은 마지막으로 전달한 시퀀스보다 오래된 데이터그램을 버림 (최신 프레임만 의미 있음)
+
+사용법
+  python udp_transport.py bench --loss 0.05     # 손실 주입 시 UDP vs TCP 지연 비교
+"""
+
+import argparse
+import random
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+from client_channel import LatencyStats
+
+
+HEADER = struct.Struct('>2sBxIQ')
+MAGIC = b'CV'
+VERSION = 1
+
+# 데이터그램 최대 크기 (IPv4 UDP 이론 한계)
+MAX_DATAGRAM = 65507
+
+# 리눅스 최소 재전송 타임아웃 (TCP 손실 모델에 사용)
+TCP_MIN_RTO = 0.2
+
+
+def pack_datagram(seq: int, payload: bytes, sent_us: Optional[int] = None) -> bytes:
+    """데이터그램 생성"""
+    if sent_us is None:
+        sent_us = int(time.time() * 1_000_000)
+    return HEADER.pack(MAGIC, VERSION, seq & 0xFFFFFFFF, sent_us) + payload
+
+
+def unpack_datagram(datagram: bytes) -> Optional[Tuple[int, int, bytes]]:
+    """데이터그램 해석 -> (시퀀스, 송신 시각 µs, 페이로드), 형식이 다르면 None"""
+    if len(datagram) < HEADER.size:
+        return None
+    magic, version, seq, sent_us = HEADER.unpack_from(datagram)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return seq, sent_us, datagram[HEADER.size:]
+
+
+class UdpTelemetrySender:
+    """UDP 텔레메트리 송신기 (구독 주소 전체에 같은 시퀀스로 전송)"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.seq = 0
+        self.sent = 0
+        self.errors = 0
+
+    def next_seq(self) -> int:
+        """틱 1개의 시퀀스 (포맷/예산이 다른 페이로드도 같은 틱이면 같은 번호로 전송)"""
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return self.seq
+
+    def send(self, payload: bytes, addresses, seq: Optional[int] = None):
+        """프레임 1개를 구독 주소들에 전송 (seq를 주지 않으면 새 시퀀스)"""
+        if not addresses:
+            return
+        datagram = pack_datagram(self.next_seq() if seq is None else seq, payload)
+        if len(datagram) > MAX_DATAGRAM:
+            self.errors += 1
+            return
+        for address in addresses:
+            try:
+                self.sock.sendto(datagram, address)
+                self.sent += 1
+            except OSError:
+                self.errors += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class UdpTelemetryReceiver:
+    """
+    UDP 텔레메트리 수신기
+    오래된/순서 뒤바뀐/중복 데이터그램은 버리고 손실/역순 통계를 기록
+    """
+
+    def __init__(self, on_payload: Callable[[bytes], None], host='0.0.0.0', port=0):
+        self.on_payload = on_payload
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(1.0)
+        self.port = self.sock.getsockname()[1]
+        self.running = False
+
+        self.last_seq = None
+        self.delivered = 0
+        self.gaps = 0          # 건너뛴 시퀀스 수 (나중에 늦게 도착한 것 포함)
+        self.reordered = 0     # 이미 더 새로운 프레임을 전달한 뒤 도착 (버림)
+        self.duplicates = 0
+        self.invalid = 0
+        self.transit = LatencyStats()  # 송신 시각 -> 수신 (같은 호스트/동기화된 시계 기준)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while self.running:
+            try:
+                datagram = self.sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle_datagram(datagram)
+
+    def handle_datagram(self, datagram: bytes):
+        """데이터그램 1개 처리 (최신이면 on_payload 호출)"""
+        parsed = unpack_datagram(datagram)
+        if parsed is None:
+            self.invalid += 1
+            return
+        seq, sent_us, payload = parsed
+
+        if self.last_seq is not None:
+            # 32비트 시퀀스 순환을 고려한 차이
+            delta = (seq - self.last_seq) & 0xFFFFFFFF
+            if delta == 0:
+                self.duplicates += 1
+                return
+            if delta >= 0x80000000:
+                self.reordered += 1
+                return
+            self.gaps += delta - 1
+
+        self.last_seq = seq
+        self.delivered += 1
+        self.transit.record(max(0.0, time.time() - sent_us / 1_000_000))
+        self.on_payload(payload)
+
+    @property
+    def lost(self) -> int:
+        """실제로 도착하지 않은 데이터그램 수 (늦게 도착해 버린 것은 제외)"""
+        return max(0, self.gaps - self.reordered)
+
+    def stats(self):
+        total = self.delivered + self.lost + self.reordered
+        return {
+            "delivered": self.delivered,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "loss_rate": self.lost / total if total else 0.0,
+        }
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+
+class LossyDatagramRelay:
+    """
+    UDP 손실 주입 중계기 (로컬 시험용)
+    listen 포트로 받은 데이터그램을 target으로 전달하되 확률적으로 버리거나 순서를 바꿈
+    """
+
+    def __init__(self, target: Tuple[str, int], loss=0.0, reorder=0.0, seed=None):
+        self.target = target
+        self.loss = loss
+        self.reorder = reorder
+        self.random = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(1.0)
+        self.port = self.sock.getsockname()[1]
+        self.running = False
+        self.dropped = 0
+        self._held = None
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while self.running:
+            try:
+                datagram = self.sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if self.random.random() < self.loss:
+                self.dropped += 1
+                continue
+            if self._held is None and self.random.random() < self.reorder:
+                self._held = datagram  # 다음 데이터그램 뒤로 보냄
+                continue
+            self.sock.sendto(datagram, self.target)
+            if self._held is not None:
+                self.sock.sendto(self._held, self.target)
+                self._held = None
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+
+class LossyStreamRelay:
+    """
+    TCP 손실 모델 중계기 (로컬 시험용)
+    사용자 공간에서는 TCP 세그먼트를 버릴 수 없으므로, 서버->클라이언트 방향의
+    길이 프리픽스 프레임을 확률적으로 '손실' 처리하여 재전송 타임아웃(RTO)만큼
+    지연시키고, 그 뒤 프레임들도 순서를 지키며 함께 대기시킴 (head-of-line blocking)
+    """
+
+    def __init__(self, target: Tuple[str, int], loss=0.0, rto=TCP_MIN_RTO, seed=None):
+        self.target = target
+        self.loss = loss
+        self.rto = rto
+        self.random = random.Random(seed)
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('127.0.0.1', 0))
+        self.server_socket.listen(5)
+        self.server_socket.settimeout(1.0)
+        self.port = self.server_socket.getsockname()[1]
+        self.running = False
+        self.delayed = 0
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while self.running:
+            try:
+                downstream, _ = self.server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            upstream = socket.create_connection(self.target)
+            threading.Thread(target=self._pipe, args=(downstream, upstream), daemon=True).start()
+            threading.Thread(target=self._lossy_pipe, args=(upstream, downstream), daemon=True).start()
+
+    def _pipe(self, source, sink):
+        """클라이언트 -> 서버 (손실 없음)"""
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                sink.sendall(data)
+        except OSError:
+            pass
+        finally:
+            sink.close()
+
+    def _lossy_pipe(self, source, sink):
+        """서버 -> 클라이언트 (프레임 단위 손실 = RTO 지연 + 뒤따르는 프레임 대기)"""
+        queue = deque()
+        cond = threading.Condition()
+        closed = []
+
+        def writer():
+            while True:
+                with cond:
+                    while not queue and not closed:
+                        cond.wait()
+                    if not queue:
+                        break
+                    release, frame = queue.popleft()
+                delay = release - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    sink.sendall(frame)
+                except OSError:
+                    break
+            sink.close()
+
+        threading.Thread(target=writer, daemon=True).start()
+
+        buffer = b''
+        last_release = 0.0
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                buffer += data
+                while len(buffer) >= 4:
+                    length = struct.unpack('>I', buffer[:4])[0]
+                    if len(buffer) < 4 + length:
+                        break
+                    frame, buffer = buffer[:4 + length], buffer[4 + length:]
+                    now = time.perf_counter()
+                    release = max(now, last_release)
+                    if self.random.random() < self.loss:
+                        release = max(release, now + self.rto)
+                        self.delayed += 1
+                    last_release = release
+                    with cond:
+                        queue.append((release, frame))
+                        cond.notify()
+        except OSError:
+            pass
+        finally:
+            with cond:
+                closed.append(True)
+                cond.notify()
+
+    def stop(self):
+        self.running = False
+        self.server_socket.close()
+
+
+def run_client(port, duration, udp=False, udp_relay=None):
+    """테스트 클라이언트로 duration초 동안 수신 후 클라이언트 반환"""
+    from test_client import CarrotViewTestClient
+
+    client = CarrotViewTestClient(port=port, protocol="framed", udp=udp, udp_relay=udp_relay, quiet=True)
+    if not client.connect():
+        return None
+    threading.Thread(target=client.receive_data, daemon=True).start()
+    time.sleep(duration)
+    client.disconnect()
+    return client
+
+
+def benchmark(loss=0.05, duration=5.0, tick_interval=0.01, rto=TCP_MIN_RTO):
+    """루프백에서 손실 주입 시 UDP/TCP 텔레메트리 지연 비교"""
+    from test_server import TestTCPServer
+
+    server = TestTCPServer(port=0, discovery_port=None, tick_interval=tick_interval)
+    server.start()
+    time.sleep(0.2)
+
+    try:
+        print(f"\n📶 손실률 {loss * 100:.1f}% | {1 / tick_interval:.0f}Hz | {duration:.0f}초씩")
+
+        tcp_relay = LossyStreamRelay(('127.0.0.1', server.port), loss=loss, rto=rto, seed=1)
+        tcp_relay.start()
+        tcp_client = run_client(tcp_relay.port, duration)
+        tcp_relay.stop()
+
+        udp_client = run_client(server.port, duration, udp=True,
+                                udp_relay=lambda target: LossyDatagramRelay(target, loss=loss, seed=1))
+
+        for label, client in (("TCP (RTO 지연 모델)", tcp_client), ("UDP (시퀀스/최신만)", udp_client)):
+            if client is None:
+                print(f"  {label}: 연결 실패")
+                continue
+            stats = client.telemetry_latency.summary()
+            line = (f"  {label:20s} 프레임 {stats['count']:5d} | p50 {stats['p50_ms']:6.1f}ms | "
+                    f"p95 {stats['p95_ms']:6.1f}ms | 최대 {stats['max_ms']:6.1f}ms")
+            if client.udp_receiver is not None:
+                udp_stats = client.udp_receiver.stats()
+                line += f" | 손실 {udp_stats['lost']} 역순 {udp_stats['reordered']}"
+            print(line)
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarrotView UDP 텔레메트리 전송")
+    parser.add_argument("command", choices=("bench",))
+    parser.add_argument("--loss", type=float, default=0.05, help="주입할 손실률 (0~1)")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--hz", type=float, default=100.0)
+    args = parser.parse_args()
+
+    benchmark(loss=args.loss, duration=args.duration, tick_interval=1.0 / args.hz)
+
+
+if __name__ == "__main__":
+    main()